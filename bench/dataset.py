@@ -0,0 +1,187 @@
+import random
+from dataclasses import dataclass, field
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post.hashtags import extract_hashtags
+from post.models import Comment, Hashtag, Like, Post, PostHashtag
+from user.models import UserFollowing
+
+BATCH_SIZE = 1000
+
+FIRST_NAMES = (
+    "Olena", "Taras", "Maria", "Andrii", "Iryna", "John", "Emma", "Liam",
+    "Sofia", "Noah", "Anna", "Lucas", "Mia", "Oleh", "Chloe", "Marco",
+)
+LAST_NAMES = (
+    "Shevchenko", "Kovalenko", "Bondarenko", "Smith", "Johnson", "Brown",
+    "Garcia", "Martin", "Rossi", "Novak", "Muller", "Kowalski",
+)
+PLACES = (
+    ("Ukraine", "Kyiv"), ("Ukraine", "Lviv"), ("Poland", "Warsaw"),
+    ("Germany", "Berlin"), ("Italy", "Rome"), ("France", "Paris"),
+    ("Spain", "Madrid"), ("USA", "Chicago"),
+)
+WORDS = (
+    "sunny", "day", "beach", "travel", "coffee", "morning", "city", "night",
+    "friends", "music", "mountains", "running", "book", "dinner", "sea",
+    "weekend", "photo", "train", "rain", "garden", "river", "market",
+)
+HASHTAGS = ("travel", "food", "music", "sport", "photo", "news")
+
+
+@dataclass
+class Dataset:
+    """Ids of the seeded rows, used by scenarios to build valid requests"""
+
+    user_ids: list[int]
+    tokens: dict[int, str]
+    following: dict[int, set[int]]
+    posts_by_author: dict[int, list[int]]
+    likes: set[tuple[int, int]] = field(default_factory=set)
+
+    def visible_post_ids(self, user_id: int) -> list[int]:
+        authors = [user_id, *self.following[user_id]]
+        return [
+            post_id
+            for author_id in authors
+            for post_id in self.posts_by_author.get(author_id, ())
+        ]
+
+
+def link_hashtags(posts: list[Post]) -> None:
+    """Create the hashtag links the post_save signal would have made"""
+    tags = {post.id: extract_hashtags(post.content) for post in posts}
+    names = set().union(*tags.values())
+    Hashtag.objects.bulk_create(
+        [Hashtag(name=name) for name in names], ignore_conflicts=True
+    )
+    hashtag_ids = dict(
+        Hashtag.objects.filter(name__in=names).values_list("name", "id")
+    )
+    PostHashtag.objects.bulk_create(
+        [
+            PostHashtag(
+                post=post, hashtag_id=hashtag_ids[name], created_at=post.created_at
+            )
+            for post in posts
+            for name in tags[post.id]
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def seed(
+    users: int,
+    posts_per_user: int,
+    follows_per_user: int,
+    likes_per_post: int,
+    comments_per_post: int,
+    random_seed: int,
+) -> Dataset:
+    """Create a synthetic social graph, identical for the same arguments"""
+    rng = random.Random(random_seed)
+    user_model = get_user_model()
+    password = make_password("bench-password")
+
+    created_users = user_model.objects.bulk_create(
+        [
+            user_model(
+                email=f"bench{number}@example.com",
+                password=password,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                country=country,
+                city=city,
+            )
+            for number, (country, city) in enumerate(
+                rng.choice(PLACES) for _ in range(users)
+            )
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = [user.id for user in created_users]
+
+    following = {
+        user_id: set(
+            rng.sample(
+                [other for other in user_ids if other != user_id],
+                min(follows_per_user, len(user_ids) - 1),
+            )
+        )
+        for user_id in user_ids
+    }
+    UserFollowing.objects.bulk_create(
+        [
+            UserFollowing(follower_id_id=follower_id, user_id_id=user_id)
+            for follower_id, followed in following.items()
+            for user_id in followed
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    posts = Post.objects.bulk_create(
+        [
+            Post(
+                author_id=user_id,
+                content=(
+                    " ".join(rng.choices(WORDS, k=12))
+                    + f" #{rng.choice(HASHTAGS)}"
+                ),
+            )
+            for user_id in user_ids
+            for _ in range(posts_per_user)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    posts_by_author = {}
+    for post in posts:
+        posts_by_author.setdefault(post.author_id, []).append(post.id)
+    link_hashtags(posts)
+
+    likes = {
+        (user_id, post.id)
+        for post in posts
+        for user_id in rng.sample(user_ids, min(likes_per_post, len(user_ids)))
+    }
+    Like.objects.bulk_create(
+        [Like(user_id=user_id, post_id=post_id) for user_id, post_id in likes],
+        batch_size=BATCH_SIZE,
+    )
+    Comment.objects.bulk_create(
+        [
+            Comment(
+                post_id=post.id,
+                user_id=rng.choice(user_ids),
+                content=" ".join(rng.choices(WORDS, k=8)),
+            )
+            for post in posts
+            for _ in range(comments_per_post)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    # bulk_create skips signals, rebuild what they would have maintained
+    for command in (
+        "rebuild_post_counters",
+        "rebuild_follow_counters",
+        "rebuild_timelines",
+    ):
+        call_command(command, stdout=StringIO())
+
+    tokens = {
+        user.id: str(AccessToken.for_user(user))
+        for user in created_users
+    }
+
+    return Dataset(
+        user_ids=user_ids,
+        tokens=tokens,
+        following=following,
+        posts_by_author=posts_by_author,
+        likes=likes,
+    )
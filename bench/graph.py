@@ -0,0 +1,355 @@
+"""Synthetic social graph at load testing scale, generated inside PostgreSQL.
+
+Rows are produced by INSERT ... SELECT over generate_series, so none of them
+pass through Python. random() is seeded with setseed() and every statement
+draws its numbers in the same order, so a seed always gives the same graph
+(on the same PostgreSQL version).
+
+Follows use the static model of preferential attachment: the k-th seeded
+user is followed with a weight of (k + 1) ** -FOLLOW_SKEW, which gives the
+early users most of the followers and the follower counts a power law tail.
+Those celebrities also post more, posts come in bursts and likes and
+comments pile up on a few popular posts.
+"""
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from bench.dataset import FIRST_NAMES, HASHTAGS, LAST_NAMES, PLACES, WORDS
+
+PASSWORD = "seed-password"
+
+# Power law exponents of the follow, post and like/comment weights
+FOLLOW_SKEW = 0.8
+POST_SKEW = 0.5
+ENGAGEMENT_SKEW = 0.9
+
+ACTIVITY_DAYS = 30
+# Posts are spread over this many bursts of activity
+BURSTS = 500
+BURST_MINUTES = 20
+
+POST_WORDS = 10
+COMMENT_WORDS = 6
+
+
+def zipf_offset(count: int, skew: float) -> str:
+    """SQL drawing an offset below count, k weighted by (k + 1) ** -skew.
+
+    Inverse transform of the continuous power law, one random() per row.
+    """
+    exponent = 1 - skew
+    return (
+        f"LEAST(floor(power(1 + random() * (power({count} + 1, {exponent}) - 1), "
+        f"1 / {exponent}))::bigint - 1, {count - 1})"
+    )
+
+
+def uniform_offset(count: int) -> str:
+    return f"floor(random() * {count})::bigint"
+
+
+def random_item(items: tuple[str, ...]) -> str:
+    array = ", ".join(f"'{item}'" for item in items)
+    return f"(ARRAY[{array}])[1 + floor(random() * {len(items)})::int]"
+
+
+def random_words(count: int) -> str:
+    return " || ' ' || ".join([random_item(WORDS)] * count)
+
+
+def reserve_ids(cursor, table: str, count: int) -> int:
+    """First id of a block of count ids taken from the table's sequence"""
+    cursor.execute(
+        """
+        SELECT setval(sequence, nextval(sequence) + %s - 1) - %s + 1
+        FROM pg_get_serial_sequence(%s, 'id') AS sequence
+        """,
+        [count, count, table],
+    )
+    return cursor.fetchone()[0]
+
+
+class GraphSeeder:
+    """Generates one graph, table by table, in statements of batch_size rows"""
+
+    def __init__(
+        self,
+        users: int,
+        avg_follows: int,
+        posts: int,
+        likes_per_post: int,
+        comments_per_post: int,
+        random_seed: int,
+        batch_size: int,
+        log: Callable[[str], None] = print,
+    ):
+        self.users = users
+        self.follows = users * avg_follows
+        self.posts = posts
+        self.likes = posts * likes_per_post
+        self.comments = posts * comments_per_post
+        self.random_seed = random_seed
+        self.batch_size = batch_size
+        self.log = log
+
+    def insert(self, label: str, total: int, sql: str, params: dict) -> None:
+        """Run sql for every range of batch_size row numbers below total"""
+        started = time.monotonic()
+        with connection.cursor() as cursor:
+            for start in range(0, total, self.batch_size):
+                end = min(start + self.batch_size, total) - 1
+                with transaction.atomic():
+                    cursor.execute(sql, {**params, "start": start, "end": end})
+        self.log(f"{label}: {total} in {time.monotonic() - started:.1f}s")
+
+    def seed(self, timelines: bool = True) -> dict[str, int]:
+        with connection.cursor() as cursor:
+            # Workers would draw from random() sequences of their own
+            cursor.execute("SET max_parallel_workers_per_gather = 0")
+            cursor.execute("SELECT setseed(%s)", [self.random_seed % 2**31 / 2**31])
+            self.first_user = reserve_ids(cursor, "user_user", self.users)
+            self.first_post = reserve_ids(cursor, "post_post", self.posts)
+            cursor.execute(
+                "INSERT INTO post_hashtag (name) SELECT unnest(%s) "
+                "ON CONFLICT DO NOTHING",
+                [list(HASHTAGS)],
+            )
+
+        try:
+            self.insert_users()
+            self.insert_follows()
+            self.insert_posts()
+            self.insert_likes()
+            self.insert_comments()
+            self.update_counters()
+            if timelines:
+                self.fill_timelines()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET max_parallel_workers_per_gather")
+
+        return {
+            "first_user_id": self.first_user,
+            "first_post_id": self.first_post,
+        }
+
+    def insert_users(self) -> None:
+        countries = tuple(country for country, _ in PLACES)
+        cities = tuple(city for _, city in PLACES)
+        self.insert(
+            "Users",
+            self.users,
+            f"""
+            INSERT INTO user_user (
+                id, password, is_superuser, first_name, last_name, is_staff,
+                is_active, date_joined, email, country, city,
+                picture_renditions, followers_count, followings_count, updated_at
+            )
+            SELECT id, %(password)s, false, first_name, last_name, false, true,
+                date_joined, 'seed' || id || '@example.com',
+                (ARRAY[{", ".join(f"'{c}'" for c in countries)}])[place],
+                (ARRAY[{", ".join(f"'{c}'" for c in cities)}])[place],
+                '{{}}', 0, 0, now()
+            FROM (
+                SELECT %(first_user)s + number AS id,
+                    {random_item(FIRST_NAMES)} AS first_name,
+                    {random_item(LAST_NAMES)} AS last_name,
+                    1 + floor(random() * {len(PLACES)})::int AS place,
+                    now() - random() * interval '{ACTIVITY_DAYS * 10} days'
+                        AS date_joined
+                FROM generate_series(%(start)s, %(end)s) AS number
+            ) AS seeded
+            """,
+            {"password": make_password(PASSWORD), "first_user": self.first_user},
+        )
+
+    def insert_follows(self) -> None:
+        self.insert(
+            "Follows",
+            self.follows,
+            f"""
+            INSERT INTO user_userfollowing (follower_id_id, user_id_id)
+            SELECT follower, followed
+            FROM (
+                SELECT %(first_user)s + {uniform_offset(self.users)} AS follower,
+                    %(first_user)s + {zipf_offset(self.users, FOLLOW_SKEW)}
+                        AS followed
+                FROM generate_series(%(start)s, %(end)s)
+            ) AS edges
+            WHERE follower <> followed
+            ON CONFLICT DO NOTHING
+            """,
+            {"first_user": self.first_user},
+        )
+
+    def insert_posts(self) -> None:
+        self.insert(
+            "Posts",
+            self.posts,
+            f"""
+            WITH inserted AS (
+                INSERT INTO post_post (
+                    id, author_id, content, created_at, image_renditions,
+                    likes_count, comments_count, version
+                )
+                SELECT %(first_post)s + number,
+                    %(first_user)s + {zipf_offset(self.users, POST_SKEW)},
+                    {random_words(POST_WORDS)} || ' #' || {random_item(HASHTAGS)},
+                    LEAST(
+                        now() - interval '{ACTIVITY_DAYS} days'
+                        + floor(random() * {BURSTS})
+                            * interval '{ACTIVITY_DAYS * 24 * 60 // BURSTS} minutes'
+                        - ln(1 - random()) * interval '{BURST_MINUTES} minutes',
+                        now()
+                    ),
+                    '{{}}', 0, 0, 1
+                FROM generate_series(%(start)s, %(end)s) AS number
+                RETURNING id, content, created_at
+            )
+            INSERT INTO post_posthashtag (post_id, hashtag_id, created_at)
+            SELECT inserted.id, post_hashtag.id, inserted.created_at
+            FROM inserted
+            JOIN post_hashtag
+                ON post_hashtag.name = substring(inserted.content from '#(\\w+)$')
+            """,
+            {"first_user": self.first_user, "first_post": self.first_post},
+        )
+
+    def insert_likes(self) -> None:
+        self.insert(
+            "Likes",
+            self.likes,
+            f"""
+            INSERT INTO post_like (user_id, post_id)
+            SELECT %(first_user)s + {uniform_offset(self.users)},
+                %(first_post)s + {zipf_offset(self.posts, ENGAGEMENT_SKEW)}
+            FROM generate_series(%(start)s, %(end)s)
+            ON CONFLICT DO NOTHING
+            """,
+            {"first_user": self.first_user, "first_post": self.first_post},
+        )
+
+    def insert_comments(self) -> None:
+        self.insert(
+            "Comments",
+            self.comments,
+            f"""
+            INSERT INTO post_comment (post_id, user_id, content, created_at)
+            SELECT comments.post_id, comments.user_id, comments.content,
+                LEAST(post_post.created_at + comments.delay, now())
+            FROM (
+                SELECT number,
+                    %(first_post)s + {zipf_offset(self.posts, ENGAGEMENT_SKEW)}
+                        AS post_id,
+                    %(first_user)s + {uniform_offset(self.users)} AS user_id,
+                    {random_words(COMMENT_WORDS)} AS content,
+                    -ln(1 - random()) * interval '2 hours' AS delay
+                FROM generate_series(%(start)s, %(end)s) AS number
+            ) AS comments
+            JOIN post_post ON post_post.id = comments.post_id
+            ORDER BY comments.number
+            """,
+            {"first_user": self.first_user, "first_post": self.first_post},
+        )
+
+    def update_counters(self) -> None:
+        """Fill the denormalized counters the skipped signals maintain"""
+        started = time.monotonic()
+        users = {"first": self.first_user, "last": self.first_user + self.users - 1}
+        posts = {"first": self.first_post, "last": self.first_post + self.posts - 1}
+        statements = [
+            (
+                "user_user",
+                "followers_count",
+                "SELECT user_id_id AS id, count(*) AS total FROM user_userfollowing "
+                "WHERE user_id_id BETWEEN %(first)s AND %(last)s GROUP BY 1",
+                users,
+            ),
+            (
+                "user_user",
+                "followings_count",
+                "SELECT follower_id_id AS id, count(*) AS total FROM user_userfollowing "
+                "WHERE follower_id_id BETWEEN %(first)s AND %(last)s GROUP BY 1",
+                users,
+            ),
+            (
+                "post_post",
+                "likes_count",
+                "SELECT post_id AS id, count(*) AS total FROM post_like "
+                "WHERE post_id BETWEEN %(first)s AND %(last)s GROUP BY 1",
+                posts,
+            ),
+            (
+                "post_post",
+                "comments_count",
+                "SELECT post_id AS id, count(*) AS total FROM post_comment "
+                "WHERE post_id BETWEEN %(first)s AND %(last)s GROUP BY 1",
+                posts,
+            ),
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, column, counts, params in statements:
+                cursor.execute(
+                    f"UPDATE {table} SET {column} = counts.total "
+                    f"FROM ({counts}) AS counts WHERE {table}.id = counts.id",
+                    params,
+                )
+        self.log(f"Counters: {time.monotonic() - started:.1f}s")
+
+    def fill_timelines(self) -> None:
+        """Timelines as rebuild_timelines would leave them: the latest posts of
+        the user and of the followed authors below the fan-out limit.
+        """
+        started = time.monotonic()
+        params = {
+            "first_user": self.first_user,
+            "last_user": self.first_user + self.users - 1,
+            "first_post": self.first_post,
+            "last_post": self.first_post + self.posts - 1,
+            "backfill": settings.TIMELINE_BACKFILL_SIZE,
+            "limit": settings.TIMELINE_FANOUT_FOLLOWER_LIMIT,
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TEMPORARY TABLE seed_latest_post ON COMMIT DROP AS
+                SELECT id, author_id, created_at
+                FROM (
+                    SELECT id, author_id, created_at, row_number() OVER (
+                        PARTITION BY author_id ORDER BY created_at DESC
+                    ) AS position
+                    FROM post_post
+                    WHERE id BETWEEN %(first_post)s AND %(last_post)s
+                ) AS ranked
+                WHERE position <= %(backfill)s
+                """,
+                params,
+            )
+            cursor.execute(
+                """
+                INSERT INTO post_timelineentry (owner_id, post_id, created_at)
+                SELECT author_id, id, created_at
+                FROM seed_latest_post
+                ON CONFLICT DO NOTHING
+                """,
+                params,
+            )
+            cursor.execute(
+                """
+                INSERT INTO post_timelineentry (owner_id, post_id, created_at)
+                SELECT follows.follower_id_id, latest.id, latest.created_at
+                FROM user_userfollowing AS follows
+                JOIN user_user AS author ON author.id = follows.user_id_id
+                JOIN seed_latest_post AS latest
+                    ON latest.author_id = follows.user_id_id
+                WHERE author.followers_count <= %(limit)s
+                    AND follows.follower_id_id BETWEEN %(first_user)s AND %(last_user)s
+                ON CONFLICT DO NOTHING
+                """,
+                params,
+            )
+        self.log(f"Timelines: {time.monotonic() - started:.1f}s")
@@ -0,0 +1,181 @@
+import json
+import os
+import platform
+import time
+
+import django
+from django.core.management import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from bench import report
+from bench.dataset import seed
+from bench.runner import TRANSPORTS, run_scenario
+from bench.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    """Command to benchmark the API routes against a seeded throwaway database"""
+
+    help = (
+        "Seed a synthetic dataset into a temporary test database and report "
+        "throughput, latency percentiles and queries per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=list(SCENARIOS),
+            help="Scenario to run, can be repeated (default: all)",
+        )
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--posts-per-user", type=int, default=10)
+        parser.add_argument("--follows-per-user", type=int, default=20)
+        parser.add_argument("--likes-per-post", type=int, default=5)
+        parser.add_argument("--comments-per-post", type=int, default=3)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Random seed of the dataset and of the request mix",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of concurrent clients",
+        )
+        parser.add_argument(
+            "--transport",
+            choices=TRANSPORTS,
+            default="wsgi",
+            help=(
+                "wsgi drives the synchronous views from client threads, asgi "
+                "drives the async handler from tasks of one event loop"
+            ),
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=200,
+            help="Scenario runs measured per scenario, split across the threads",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=10,
+            help="Unmeasured scenario runs per thread before measuring",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument(
+            "--baseline",
+            help="Compare against the JSON results of a previous run",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=10.0,
+            help="Allowed p95 latency growth in percent against the baseline",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["users"] < options["concurrency"]:
+            raise CommandError("Need at least one user per client")
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            results = self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        comparison = {}
+        if baseline is not None:
+            comparison = report.compare(
+                results["results"], baseline, options["max_regression"]
+            )
+            results["comparison"] = comparison
+
+        self.stdout.write(report.format_table(results["results"], comparison))
+
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        regressed = [name for name, row in comparison.items() if row["regressed"]]
+        if regressed:
+            raise CommandError(f"Regressed against baseline: {', '.join(regressed)}")
+
+    def run(self, options) -> dict:
+        self.stdout.write("Seeding dataset...")
+        start = time.perf_counter()
+        dataset = seed(
+            users=options["users"],
+            posts_per_user=options["posts_per_user"],
+            follows_per_user=options["follows_per_user"],
+            likes_per_post=options["likes_per_post"],
+            comments_per_post=options["comments_per_post"],
+            random_seed=options["seed"],
+        )
+        self.stdout.write(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        results = {}
+        for name in options["scenarios"] or list(SCENARIOS):
+            self.stdout.write(f"Running {name}...")
+            samples, wall = run_scenario(
+                SCENARIOS[name],
+                dataset,
+                options["concurrency"],
+                options["iterations"],
+                options["warmup"],
+                options["seed"],
+                options["transport"],
+            )
+            results.update(report.summarize(samples, wall))
+
+        return {
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": " ".join(
+                    [
+                        connection.vendor,
+                        ".".join(map(str, connection.get_database_version())),
+                    ]
+                ),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+            },
+            "options": {
+                name: options[name]
+                for name in (
+                    "users",
+                    "posts_per_user",
+                    "follows_per_user",
+                    "likes_per_post",
+                    "comments_per_post",
+                    "seed",
+                    "concurrency",
+                    "transport",
+                    "iterations",
+                    "warmup",
+                )
+            },
+            "results": results,
+        }
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from bench.graph import PASSWORD, GraphSeeder
+from user import importer
+
+
+class Command(BaseCommand):
+    """Command to seed a large synthetic social graph for load testing"""
+
+    help = (
+        "Generate users with a power law follow graph, bursty posts and "
+        "skewed likes and comments, the same for the same --seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--avg-follows",
+            type=int,
+            default=20,
+            help="Follows drawn per user, duplicates and self follows are dropped",
+        )
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--likes-per-post", type=int, default=5)
+        parser.add_argument("--comments-per-post", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000000,
+            help="Number of rows generated per INSERT statement",
+        )
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help=(
+                "Drop secondary indexes and foreign keys of the seeded tables "
+                "while generating and recreate them at the end"
+            ),
+        )
+        parser.add_argument(
+            "--skip-timelines",
+            action="store_true",
+            help="Do not fill the timelines of the seeded users",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2 or options["posts"] < 1:
+            raise CommandError("Need at least two users and one post")
+
+        seeder = GraphSeeder(
+            users=options["users"],
+            avg_follows=options["avg_follows"],
+            posts=options["posts"],
+            likes_per_post=options["likes_per_post"],
+            comments_per_post=options["comments_per_post"],
+            random_seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+
+        started = time.monotonic()
+        deferred = []
+        if options["defer_indexes"]:
+            statements = importer.deferrable_statements()
+            deferred = [create for _, create in statements]
+            importer.execute_all([drop for drop, _ in statements])
+        try:
+            ids = seeder.seed(timelines=not options["skip_timelines"])
+        finally:
+            if deferred:
+                index_started = time.monotonic()
+                importer.execute_all(deferred)
+                self.stdout.write(
+                    f"Indexes: {time.monotonic() - index_started:.1f}s"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded users {ids['first_user_id']}-"
+                f"{ids['first_user_id'] + options['users'] - 1} "
+                f"(password {PASSWORD!r}) in {time.monotonic() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,100 @@
+import statistics
+
+from bench.runner import Sample
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def summarize(samples: list[Sample], wall: float) -> dict[str, dict]:
+    """Throughput, latency percentiles and queries per request of each request name"""
+    by_name: dict[str, list[Sample]] = {}
+    for sample in samples:
+        by_name.setdefault(sample.name, []).append(sample)
+
+    summary = {}
+    for name, group in by_name.items():
+        latencies = [sample.seconds * 1000 for sample in group]
+        summary[name] = {
+            "requests": len(group),
+            "errors": sum(sample.status >= 400 for sample in group),
+            "throughput_rps": round(len(group) / wall, 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "queries_per_request": round(
+                statistics.fmean(sample.queries for sample in group), 2
+            ),
+        }
+    return summary
+
+
+def change(current: float, baseline: float) -> float | None:
+    if not baseline:
+        return None
+    return round((current - baseline) / baseline * 100, 1)
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> dict[str, dict]:
+    """Relative change of every request measured in both runs.
+
+    A request regresses when its p95 latency grew by more than
+    ``max_regression`` percent or when it runs at least one more query on
+    average, smaller drifts come from per-user caches warming up.
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        p95_change = change(current["p95_ms"], previous["p95_ms"])
+        comparison[name] = {
+            "p95_change_pct": p95_change,
+            "throughput_change_pct": change(
+                current["throughput_rps"], previous["throughput_rps"]
+            ),
+            "queries_change": round(
+                current["queries_per_request"] - previous["queries_per_request"], 2
+            ),
+            "regressed": (
+                (p95_change is not None and p95_change > max_regression)
+                or current["queries_per_request"]
+                >= previous["queries_per_request"] + 1
+            ),
+        }
+    return comparison
+
+
+def format_table(results: dict, comparison: dict) -> str:
+    header = (
+        f"{'request':<16}{'reqs':>7}{'err':>5}{'rps':>9}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+    )
+    if comparison:
+        header += f"{'p95 Δ%':>9}{'rps Δ%':>9}"
+
+    lines = [header, "-" * len(header)]
+    for name, row in results.items():
+        line = (
+            f"{name:<16}{row['requests']:>7}{row['errors']:>5}"
+            f"{row['throughput_rps']:>9}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+            f"{row['p99_ms']:>9}{row['queries_per_request']:>9}"
+        )
+        if name in comparison:
+            compared = comparison[name]
+            line += (
+                f"{format_change(compared['p95_change_pct']):>9}"
+                f"{format_change(compared['throughput_change_pct']):>9}"
+            )
+            if compared["regressed"]:
+                line += "  REGRESSED"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_change(value: float | None) -> str:
+    return "-" if value is None else f"{value:+}"
@@ -0,0 +1,216 @@
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import connections
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from bench.dataset import Dataset
+from bench.scenarios import Step
+from social_media_api.middleware import record_queries
+
+TRANSPORTS = ("wsgi", "asgi")
+
+
+@dataclass
+class Sample:
+    name: str
+    seconds: float
+    queries: int
+    status: int
+
+
+class Session:
+    """One virtual client, acting as a single seeded user"""
+
+    def __init__(self, dataset: Dataset, user_id: int, rng: random.Random):
+        self.dataset = dataset
+        self.user_id = user_id
+        self.rng = rng
+        self.samples: list[Sample] = []
+        self.record = True
+        self.headers = {"Authorization": f"Bearer {dataset.tokens[user_id]}"}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers["Authorization"])
+        self.async_client = AsyncClient()
+        self.visible_post_ids = dataset.visible_post_ids(user_id)
+
+    def pick_not_followed(self) -> int:
+        followed = self.dataset.following[self.user_id]
+        while True:
+            user_id = self.rng.choice(self.dataset.user_ids)
+            if user_id != self.user_id and user_id not in followed:
+                return user_id
+
+    def has_liked(self, post_id: int) -> bool:
+        return (self.user_id, post_id) in self.dataset.likes
+
+    def add_sample(self, name: str, seconds: float, queries: int, response) -> None:
+        if self.record:
+            self.samples.append(Sample(name, seconds, queries, response.status_code))
+
+    def call(self, name: str, method: str, path: str, data: dict | None = None):
+        with record_queries() as recorder:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(path, data, format="json")
+            seconds = time.perf_counter() - start
+
+        self.add_sample(name, seconds, len(recorder.timings), response)
+        return response
+
+    async def acall(self, name: str, method: str, path: str, data: dict | None = None):
+        """Send a request through the ASGI handler, as a server would.
+
+        Like ASGIHandler, every request gets a thread sensitive context of its
+        own, and its connections are closed with it since the thread goes away.
+        """
+        kwargs = {"headers": self.headers}
+        if method != "get":
+            kwargs["content_type"] = "application/json"
+            data = data or {}
+
+        with record_queries() as recorder:
+            async with ThreadSensitiveContext():
+                start = time.perf_counter()
+                response = await getattr(self.async_client, method)(
+                    path, data, **kwargs
+                )
+                seconds = time.perf_counter() - start
+                await sync_to_async(connections.close_all)()
+
+        self.add_sample(name, seconds, len(recorder.timings), response)
+        return response
+
+
+def run_scenario(
+    func,
+    dataset: Dataset,
+    concurrency: int,
+    iterations: int,
+    warmup: int,
+    random_seed: int,
+    transport: str = "wsgi",
+) -> tuple[list[Sample], float]:
+    """Run a scenario from concurrent clients, returns samples and wall time.
+
+    WSGI clients are threads, ASGI clients are tasks on the event loop of a
+    single worker. Each client acts as its own slice of the seeded users, so
+    clients never race each other on the same like or follow.
+    """
+    sessions = []
+    clients = []
+    for number in range(concurrency):
+        user_ids = dataset.user_ids[number::concurrency]
+        rng = random.Random(f"{random_seed}:{func.__name__}:{number}")
+        client_sessions = [Session(dataset, user_id, rng) for user_id in user_ids]
+        count = iterations // concurrency + (number < iterations % concurrency)
+        sessions.extend(client_sessions)
+        clients.append((client_sessions, count, rng))
+
+    if transport == "asgi":
+        wall = asyncio.run(drive_async(func, clients, warmup))
+    else:
+        wall = drive_threads(func, clients, warmup)
+
+    return [sample for session in sessions for sample in session.samples], wall
+
+
+def drive_threads(func, clients, warmup) -> float:
+    start_barrier = threading.Barrier(len(clients) + 1)
+    errors = []
+    threads = [
+        threading.Thread(
+            target=drive,
+            args=(func, sessions, count, warmup, rng, start_barrier, errors),
+            name=f"bench-{number}",
+        )
+        for number, (sessions, count, rng) in enumerate(clients)
+    ]
+
+    for thread in threads:
+        thread.start()
+    try:
+        start_barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if errors:
+        # The client that failed first, not the ones it released from the barrier
+        raise next(
+            (
+                error
+                for error in errors
+                if not isinstance(error, threading.BrokenBarrierError)
+            ),
+            errors[0],
+        )
+    return time.perf_counter() - start
+
+
+def drive(func, sessions, count, warmup, rng, start_barrier, errors) -> None:
+    try:
+        try:
+            for session in sessions:
+                session.record = False
+            for _ in range(warmup):
+                run_steps(func, rng.choice(sessions))
+            for session in sessions:
+                session.record = True
+        except BaseException:
+            # Release the clients and the timer waiting for this one
+            start_barrier.abort()
+            raise
+
+        start_barrier.wait()
+        for _ in range(count):
+            run_steps(func, rng.choice(sessions))
+    except BaseException as error:
+        errors.append(error)
+    finally:
+        connections.close_all()
+
+
+def run_steps(func, session: Session) -> None:
+    steps = func(session)
+    response = None
+    while (step := next_step(steps, response)) is not None:
+        response = session.call(*step)
+
+
+def next_step(steps, response) -> Step | None:
+    """Next step of a scenario, which receives the response of the last one"""
+    try:
+        return steps.send(response)
+    except StopIteration:
+        return None
+
+
+async def drive_async(func, clients, warmup) -> float:
+    async def run_client(sessions, count, rng):
+        for _ in range(count):
+            await arun_steps(func, rng.choice(sessions))
+
+    for sessions, _, rng in clients:
+        for session in sessions:
+            session.record = False
+        for _ in range(warmup):
+            await arun_steps(func, rng.choice(sessions))
+        for session in sessions:
+            session.record = True
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(*client) for client in clients))
+    return time.perf_counter() - start
+
+
+async def arun_steps(func, session: Session) -> None:
+    steps = func(session)
+    response = None
+    while (step := next_step(steps, response)) is not None:
+        response = await session.acall(*step)
@@ -0,0 +1,86 @@
+"""Request mixes driven by the benchmark, one generator per scenario.
+
+A scenario yields (name, method, path, data) steps and the runner sends them
+over the chosen transport, the response of a step is the value of its yield.
+Every scenario leaves the data as it found it, so runs stay comparable: a
+like is followed by an unlike, a follow by an unfollow, a new comment is
+deleted.
+"""
+from typing import Callable, Generator, Iterator
+
+from django.urls import reverse
+
+Step = tuple[str, str, str, dict | None]
+
+SCENARIOS: dict[str, Callable[..., Iterator[Step]]] = {}
+
+SEARCH_TERMS = ("olena", "shevcenko", "kyiv", "jon smit", "rome", "marco rossi")
+
+
+def scenario(func: Callable) -> Callable:
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+@scenario
+def feed_list(session) -> Iterator[Step]:
+    yield "feed_list", "get", reverse("post:post-list"), None
+
+
+@scenario
+def post_detail(session) -> Iterator[Step]:
+    post_id = session.rng.choice(session.visible_post_ids)
+    yield "post_detail", "get", reverse("post:post-detail", args=[post_id]), None
+
+
+@scenario
+def user_detail(session) -> Iterator[Step]:
+    user_id = session.rng.choice(session.dataset.user_ids)
+    yield "user_detail", "get", reverse("user:user-detail", args=[user_id]), None
+
+
+@scenario
+def like_unlike(session) -> Iterator[Step]:
+    post_id = session.rng.choice(session.visible_post_ids)
+    like = ("like", reverse("post:post-like", args=[post_id]))
+    unlike = ("unlike", reverse("post:post-unlike", args=[post_id]))
+    steps = (unlike, like) if session.has_liked(post_id) else (like, unlike)
+    for name, path in steps:
+        yield name, "post", path, None
+
+
+@scenario
+def comment_create(session) -> Generator[Step, object, None]:
+    post_id = session.rng.choice(session.visible_post_ids)
+    response = yield (
+        "comment_create",
+        "post",
+        reverse("post:comment-list", kwargs={"post_id": post_id}),
+        {"content": "Benchmark comment"},
+    )
+    yield (
+        "comment_delete",
+        "delete",
+        reverse(
+            "post:comment-detail",
+            kwargs={"post_id": post_id, "id": response.json()["id"]},
+        ),
+        None,
+    )
+
+
+@scenario
+def follow_unfollow(session) -> Iterator[Step]:
+    user_id = session.pick_not_followed()
+    yield "follow", "post", reverse("user:user-follow", args=[user_id]), None
+    yield "unfollow", "post", reverse("user:user-unfollow", args=[user_id]), None
+
+
+@scenario
+def user_search(session) -> Iterator[Step]:
+    yield (
+        "user_search",
+        "get",
+        reverse("user:user-list"),
+        {"q": session.rng.choice(SEARCH_TERMS)},
+    )
@@ -0,0 +1,77 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.queue import claim, run
+
+
+class Command(BaseCommand):
+    """Command to run background jobs stored in the database"""
+
+    help = "Claim and run jobs, with JOBS_QUEUES threads per queue by default"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue",
+            action="append",
+            dest="queues",
+            help="Queue to work on, can be repeated (default: all JOBS_QUEUES)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Threads per queue, overrides JOBS_QUEUES",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queues have no due jobs left",
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        threads = []
+        for queue in options["queues"] or list(settings.JOBS_QUEUES):
+            concurrency = options["concurrency"] or settings.JOBS_QUEUES.get(queue, 1)
+            for number in range(concurrency):
+                worker = f"{socket.gethostname()}:{os.getpid()}:{queue}:{number}"
+                threads.append(
+                    threading.Thread(
+                        target=self.work,
+                        args=(queue, worker, stop, options["once"]),
+                        name=worker,
+                        daemon=True,
+                    )
+                )
+
+        self.stdout.write(f"Starting {len(threads)} worker threads...")
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+
+        self.stdout.write(self.style.SUCCESS("Worker stopped"))
+
+    @staticmethod
+    def work(queue: str, worker: str, stop: threading.Event, once: bool) -> None:
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim(queue, worker)
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(settings.JOBS_POLL_INTERVAL)
+                    continue
+                run(job)
+        finally:
+            connection.close()
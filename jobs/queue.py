@@ -0,0 +1,124 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry: dict[str, Callable] = {}
+
+
+def task(func: Callable) -> Callable:
+    """Register a function so it can be enqueued by its dotted path"""
+    registry[f"{func.__module__}.{func.__name__}"] = func
+    return func
+
+
+def get_task(name: str) -> Callable:
+    if name not in registry:
+        import_string(name)
+    if name not in registry:
+        raise LookupError(f"{name} is not a registered task")
+    return registry[name]
+
+
+def task_name(func: Callable | str) -> str:
+    return func if isinstance(func, str) else f"{func.__module__}.{func.__name__}"
+
+
+def enqueue(
+    func: Callable | str,
+    *,
+    queue: str = "default",
+    run_at=None,
+    max_attempts: int | None = None,
+    **kwargs,
+) -> Job | None:
+    """Store a job in the caller's transaction, or run it inline in eager mode"""
+    name = task_name(func)
+    if settings.JOBS_EAGER:
+        get_task(name)(**kwargs)
+        return None
+
+    return Job.objects.create(
+        queue=queue,
+        task=name,
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_on_commit(func: Callable | str, **options) -> None:
+    """Enqueue a job only once the current transaction has committed"""
+    transaction.on_commit(partial(enqueue, func, **options))
+
+
+def claim(queue: str, worker: str) -> Job | None:
+    """Lock the next due job of a queue, skipping rows other workers hold.
+
+    Jobs left running longer than JOBS_LOCK_TIMEOUT belong to a dead worker
+    and are claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.Status.PENDING, run_at__lte=now)
+                | Q(status=Job.Status.RUNNING, locked_at__lt=stale),
+                queue=queue,
+            )
+            .order_by("run_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = Job.Status.RUNNING
+        job.attempts += 1
+        job.locked_at = now
+        job.locked_by = worker
+        job.save(update_fields=["status", "attempts", "locked_at", "locked_by"])
+
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at JOBS_RETRY_BACKOFF_MAX"""
+    delay = settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return min(delay, settings.JOBS_RETRY_BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+
+def run(job: Job) -> None:
+    """Execute a claimed job, drop it on success and reschedule it on failure"""
+    try:
+        get_task(job.task)(**job.kwargs)
+    except Exception:
+        logger.exception("Job %s %s failed", job.id, job.task)
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.PENDING
+            job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.delete()
+        return
+
+    job.save(
+        update_fields=["status", "run_at", "locked_at", "last_error", "finished_at"]
+    )
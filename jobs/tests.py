@@ -0,0 +1,159 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, enqueue, run, task
+
+calls = []
+
+
+@task
+def record_call(value: int) -> None:
+    calls.append(value)
+
+
+@task
+def fail(message: str) -> None:
+    raise RuntimeError(message)
+
+
+def create_job(func=record_call, **fields) -> Job:
+    fields = {"kwargs": {"value": 1}, **fields}
+    return Job.objects.create(task=f"{func.__module__}.{func.__name__}", **fields)
+
+
+@override_settings(JOBS_EAGER=False)
+class EnqueueTests(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_enqueue_stores_job(self) -> None:
+        job = enqueue(record_call, queue="images", value=3)
+
+        self.assertEqual(job.task, "jobs.tests.record_call")
+        self.assertEqual(job.queue, "images")
+        self.assertEqual(job.kwargs, {"value": 3})
+        self.assertEqual(calls, [])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_enqueue_runs_inline(self) -> None:
+        self.assertIsNone(enqueue(record_call, value=3))
+
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
+
+
+class ClaimTests(TestCase):
+    def test_claims_oldest_due_job(self) -> None:
+        now = timezone.now()
+        later = create_job(run_at=now - timedelta(seconds=1))
+        oldest = create_job(run_at=now - timedelta(seconds=5))
+        create_job(run_at=now + timedelta(minutes=1))
+        create_job(queue="images", run_at=now - timedelta(minutes=1))
+
+        job = claim("default", "worker-1")
+
+        self.assertEqual(job, oldest)
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, "worker-1")
+        self.assertEqual(claim("default", "worker-2"), later)
+        self.assertIsNone(claim("default", "worker-3"))
+
+    @override_settings(JOBS_LOCK_TIMEOUT=60)
+    def test_reclaims_job_of_dead_worker(self) -> None:
+        create_job(
+            status=Job.Status.RUNNING,
+            attempts=1,
+            locked_at=timezone.now() - timedelta(minutes=2),
+            locked_by="dead",
+        )
+        create_job(
+            status=Job.Status.RUNNING,
+            attempts=1,
+            locked_at=timezone.now(),
+            locked_by="alive",
+        )
+
+        job = claim("default", "worker-1")
+
+        self.assertEqual(job.locked_by, "worker-1")
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(claim("default", "worker-2"))
+
+    def test_failed_jobs_are_not_claimed(self) -> None:
+        create_job(status=Job.Status.FAILED)
+
+        self.assertIsNone(claim("default", "worker-1"))
+
+
+class ClaimLockingTests(TransactionTestCase):
+    def test_skips_job_locked_by_another_worker(self) -> None:
+        locked = create_job(run_at=timezone.now() - timedelta(seconds=5))
+        free = create_job()
+        row_locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=locked.pk)
+                    row_locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(row_locked.wait(10))
+            self.assertEqual(claim("default", "worker-1"), free)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual(claim("default", "worker-2"), locked)
+
+
+@override_settings(JOBS_RETRY_BACKOFF=10, JOBS_RETRY_BACKOFF_MAX=600)
+class RunTests(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_successful_job_is_deleted(self) -> None:
+        create_job(kwargs={"value": 7})
+
+        run(claim("default", "worker-1"))
+
+        self.assertEqual(calls, [7])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_later(self) -> None:
+        create_job(fail, kwargs={"message": "boom"}, max_attempts=3)
+        job = claim("default", "worker-1")
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertIsNone(job.locked_at)
+        self.assertIn("RuntimeError: boom", job.last_error)
+        # 10s backoff for the first attempt, with jitter of +-50%
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertIsNone(claim("default", "worker-2"))
+
+    def test_job_fails_after_last_attempt(self) -> None:
+        create_job(fail, kwargs={"message": "boom"}, attempts=2, max_attempts=3)
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run(claim("default", "worker-1"))
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
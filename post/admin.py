@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from post.models import Post, Like, Comment
+from post.models import Post, Like, Comment, Hashtag
 
 admin.site.register(Post)
+admin.site.register(Hashtag)
 admin.site.register(Like)
 admin.site.register(Comment)
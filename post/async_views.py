@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBase
+
+from rest_framework.exceptions import NotFound
+
+from post import cache as post_cache
+from post.comments import latest_comments_prefetch
+from post.models import Post
+from post.pagination import FeedCursorPagination
+from post.serializers import PostDetailSerializer, PostListSerializer
+from post.views import (
+    annotate_viewer_has_liked,
+    detail_response_data,
+    feed_page_etag,
+    feed_posts,
+    post_detail_etag,
+)
+from social_media_api import aio
+from social_media_api.conditional import add_validators, not_modified
+from user import graph
+
+
+@aio.async_api_view
+async def feed_list(request) -> HttpResponseBase:
+    """Home feed, the hashtag and comment previews of a page load concurrently"""
+    queryset = await sync_to_async(feed_posts)(
+        request.user, request.query_params.get("hashtag")
+    )
+    paginator = FeedCursorPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(queryset, request)
+    etag = feed_page_etag(request, page, paginator)
+    if response := not_modified(request, etag):
+        return response
+
+    await aio.prefetch_concurrently(page, "hashtags", latest_comments_prefetch())
+    serializer = PostListSerializer(page, many=True, context={"request": request})
+    response = aio.json_response(paginator.get_paginated_response(serializer.data).data)
+    return add_validators(response, etag)
+
+
+async def build_detail_data(post_id: int) -> dict:
+    post = await Post.objects.defer("search_vector").aget(pk=post_id)
+    await aio.prefetch_concurrently([post], "hashtags", latest_comments_prefetch())
+    return PostDetailSerializer(post).data
+
+
+@aio.async_api_view
+async def post_detail(request, pk: int) -> HttpResponseBase:
+    author_ids = await sync_to_async(graph.visible_author_ids)(request.user)
+    row = await (
+        annotate_viewer_has_liked(
+            Post.objects.filter(pk=pk, author_id__in=author_ids), request.user
+        )
+        .values_list("id", "version", "viewer_has_liked")
+        .afirst()
+    )
+    if row is None:
+        raise NotFound
+
+    post_id, version, viewer_has_liked = row
+    etag = post_detail_etag(post_id, version, viewer_has_liked)
+    if response := not_modified(request, etag):
+        return response
+
+    data = await post_cache.aget_or_build_detail(
+        post_id, version, lambda: build_detail_data(post_id)
+    )
+    response = aio.json_response(
+        detail_response_data(request, data, viewer_has_liked)
+    )
+    return add_validators(response, etag)
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from social_media_api.metrics import observe_cache
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def detail_cache_key(post_id: int, version: int) -> str:
+    return f"post:detail:{post_id}:v{version}"
+
+
+def get_or_build_detail(post_id: int, version: int, build: Callable[[], dict]) -> dict:
+    """Return the cached detail payload of a post version, building it once.
+
+    A bumped version changes the key, so a payload is never stale and old
+    versions just age out. On a miss only the request that wins the lock
+    renders the payload, concurrent readers wait for it instead of all
+    hitting the database at once.
+    """
+    key = detail_cache_key(post_id, version)
+    data = cache.get(key)
+    observe_cache("post_detail", data is not None)
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.POST_DETAIL_CACHE_LOCK_TIMEOUT
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            data = build()
+            cache.set(key, data, settings.POST_DETAIL_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    return build()
+
+
+async def aget_or_build_detail(
+    post_id: int, version: int, build: Callable[[], Awaitable[dict]]
+) -> dict:
+    """Async twin of get_or_build_detail, waiting on the lock without a thread"""
+    key = detail_cache_key(post_id, version)
+    data = await cache.aget(key)
+    observe_cache("post_detail", data is not None)
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.POST_DETAIL_CACHE_LOCK_TIMEOUT
+    if await cache.aadd(lock_key, 1, lock_timeout):
+        try:
+            data = await build()
+            await cache.aset(key, data, settings.POST_DETAIL_CACHE_TIMEOUT)
+        finally:
+            await cache.adelete(lock_key)
+        return data
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+
+    return await build()
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+from post.models import Comment
+
+
+def latest_comments_prefetch(limit: int | None = None) -> Prefetch:
+    """Prefetch the newest comments of each post into ``latest_comments``.
+
+    Rows are numbered per post with ROW_NUMBER() OVER (PARTITION BY post_id),
+    so the previews of a whole page of posts come from a single query. The
+    window numbers every comment of those posts before the filter keeps the
+    first ``limit``, the query reads all of their comments through
+    ``comment_post_created_idx`` but only sends ``limit`` per post.
+    """
+    limit = settings.POST_COMMENT_PREVIEW_SIZE if limit is None else limit
+    queryset = Comment.objects.annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F("post_id"),
+            order_by=(F("created_at").desc(), F("id").desc()),
+        )
+    ).filter(row_number__lte=limit)
+
+    return Prefetch(
+        "comments",
+        queryset=queryset.order_by("-created_at", "-id"),
+        to_attr="latest_comments",
+    )
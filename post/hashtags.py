@@ -0,0 +1,41 @@
+import re
+
+from post.models import Hashtag, Post, PostHashtag
+
+HASHTAG_PATTERN = re.compile(r"#(\w{1,50})")
+
+
+def normalize_hashtag(value: str) -> str:
+    return value.strip().lstrip("#").lower()
+
+
+def extract_hashtags(text: str | None) -> set[str]:
+    """Return the normalized hashtags mentioned in a text"""
+    return {normalize_hashtag(tag) for tag in HASHTAG_PATTERN.findall(text or "")}
+
+
+def sync_post_hashtags(post: Post, created: bool = False) -> None:
+    """Make the post's hashtag links match the tags in its content"""
+    names = extract_hashtags(post.content)
+    current = {}
+    if not created:
+        current = dict(post.post_hashtags.values_list("hashtag__name", "id"))
+
+    stale_ids = [link_id for name, link_id in current.items() if name not in names]
+    if stale_ids:
+        PostHashtag.objects.filter(id__in=stale_ids).delete()
+
+    new_names = names - current.keys()
+    if not new_names:
+        return
+
+    Hashtag.objects.bulk_create(
+        [Hashtag(name=name) for name in new_names], ignore_conflicts=True
+    )
+    PostHashtag.objects.bulk_create(
+        [
+            PostHashtag(post=post, hashtag=hashtag, created_at=post.created_at)
+            for hashtag in Hashtag.objects.filter(name__in=new_names)
+        ],
+        ignore_conflicts=True,
+    )
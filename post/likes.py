@@ -0,0 +1,67 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from post.models import Post, Like
+
+
+def shift_likes_count(post_ids: list[int], delta: int) -> None:
+    """Apply a like delta to many posts in one UPDATE and bump their versions"""
+    if post_ids:
+        Post.objects.filter(id__in=post_ids).update(
+            likes_count=Greatest(F("likes_count") + delta, 0),
+            version=F("version") + 1,
+        )
+
+
+def bulk_like(user_id: int, post_ids: list[int]) -> list[int]:
+    """Like many posts at once, returns the ids that were not liked before.
+
+    Relies on the (post, user) unique constraint: rows that already exist
+    are skipped by ON CONFLICT DO NOTHING, so replays are idempotent.
+    """
+    if not post_ids:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Like._meta.db_table} (post_id, user_id)
+            SELECT post_id, %s FROM unnest(%s::bigint[]) AS post_id
+            ON CONFLICT (post_id, user_id) DO NOTHING
+            RETURNING post_id
+            """,
+            [user_id, post_ids],
+        )
+        liked = [row[0] for row in cursor.fetchall()]
+
+    shift_likes_count(liked, 1)
+    return liked
+
+
+def bulk_unlike(user_id: int, post_ids: list[int]) -> list[int]:
+    """Unlike many posts at once, returns the ids that were liked before"""
+    if not post_ids:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {Like._meta.db_table}
+            WHERE user_id = %s AND post_id = ANY(%s::bigint[])
+            RETURNING post_id
+            """,
+            [user_id, post_ids],
+        )
+        unliked = [row[0] for row in cursor.fetchall()]
+
+    shift_likes_count(unliked, -1)
+    return unliked
+
+
+@transaction.atomic
+def apply_likes(user_id: int, like_ids: list[int], unlike_ids: list[int]) -> dict:
+    return {
+        "liked": bulk_like(user_id, like_ids),
+        "unliked": bulk_unlike(user_id, unlike_ids),
+    }
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.core.management import BaseCommand
+
+from post.models import Post, Like, Comment
+
+
+def count_subquery(model) -> Coalesce:
+    rows = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    """Command to rebuild denormalized like and comment counters on posts"""
+
+    help = "Recalculate Post.likes_count and Post.comments_count from source rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts fixed per UPDATE statement",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report posts with drifted counters, do not fix them",
+        )
+
+    def handle(self, *args, **options):
+        drifted_ids = (
+            Post.objects.annotate(
+                actual_likes=count_subquery(Like),
+                actual_comments=count_subquery(Comment),
+            )
+            .filter(
+                ~Q(likes_count=F("actual_likes"))
+                | ~Q(comments_count=F("actual_comments"))
+            )
+            .order_by()
+            .values_list("id", flat=True)
+        )
+
+        total = 0
+        batch = []
+        for post_id in drifted_ids.iterator(chunk_size=options["batch_size"]):
+            batch.append(post_id)
+            if len(batch) >= options["batch_size"]:
+                total += self.reconcile(batch, options["dry_run"])
+                batch = []
+        if batch:
+            total += self.reconcile(batch, options["dry_run"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"Posts with drifted counters: {total}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Post counters reconciled: {total}"))
+
+    @staticmethod
+    def reconcile(post_ids: list[int], dry_run: bool) -> int:
+        if dry_run:
+            return len(post_ids)
+
+        with transaction.atomic():
+            return Post.objects.filter(id__in=post_ids).update(
+                likes_count=count_subquery(Like),
+                comments_count=count_subquery(Comment),
+                version=F("version") + 1,
+            )
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from post import timeline
+
+
+class Command(BaseCommand):
+    """Command to rebuild precomputed home timelines from the follow graph"""
+
+    help = "Refill TimelineEntry rows for all users or for the given user ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild the timelines of these users",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("id")
+        if options["user_ids"]:
+            users = users.filter(id__in=options["user_ids"])
+
+        total = 0
+        for user in users.only("id").iterator():
+            timeline.rebuild_timeline(user)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Timelines rebuilt: {total}"))
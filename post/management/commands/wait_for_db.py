@@ -1,21 +1,49 @@
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+
+MAX_DELAY = 5
 
 
 class Command(BaseCommand):
-    """Command to pause execution until db is available"""
+    """Command to pause execution until db answers queries"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to keep retrying before giving up",
+        )
 
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
+        connection = connections[options["database"]]
+        deadline = time.monotonic() + options["timeout"]
+        delay = 0.5
+
+        while True:
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("Database unavailable, waiting 2 seconds...")
-                time.sleep(2)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                break
+            except OperationalError as error:
+                connection.close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"Database unavailable after {options['timeout']:g} "
+                        f"seconds: {error}"
+                    )
+                wait = min(delay, remaining)
+                self.stdout.write(
+                    f"Database unavailable, waiting {wait:.1f} seconds..."
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, MAX_DELAY)
 
+        connection.close()
         self.stdout.write(self.style.SUCCESS("Database available!"))
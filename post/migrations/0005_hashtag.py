@@ -0,0 +1,150 @@
+# Generated by Django 4.2 on 2026-10-18 18:53
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CONTENT_HASHTAG_PATTERN = re.compile(r"#(\w{1,50})")
+COLUMN_HASHTAG_PATTERN = re.compile(r"#?(\w{1,50})")
+
+
+def fill_hashtags(apps, schema_editor):
+    """Link posts to the tags of the old hashtag column and of their content.
+
+    Content is the only source of tags from now on and sync_post_hashtags()
+    drops links to tags it doesn't mention, so every legacy tag missing from
+    the content is appended to it.
+    """
+    Post = apps.get_model("post", "Post")
+    Hashtag = apps.get_model("post", "Hashtag")
+    PostHashtag = apps.get_model("post", "PostHashtag")
+
+    posts = Post.objects.order_by().values_list(
+        "id", "content", "hashtag", "created_at"
+    )
+    batch = []
+    edited_posts = []
+    for post_id, content, hashtag, created_at in posts.iterator(chunk_size=1000):
+        names = {tag.lower() for tag in CONTENT_HASHTAG_PATTERN.findall(content or "")}
+        legacy_names = [
+            tag.lower() for tag in COLUMN_HASHTAG_PATTERN.findall(hashtag or "")
+        ]
+        missing = [name for name in dict.fromkeys(legacy_names) if name not in names]
+        if missing:
+            edited_posts.append(
+                Post(id=post_id, content=append_hashtags(content, missing))
+            )
+            names.update(missing)
+        batch.extend((post_id, name, created_at) for name in names)
+
+        if len(batch) >= 1000 or len(edited_posts) >= 1000:
+            link_hashtags(Hashtag, PostHashtag, batch)
+            Post.objects.bulk_update(edited_posts, ["content"])
+            batch = []
+            edited_posts = []
+
+    link_hashtags(Hashtag, PostHashtag, batch)
+    Post.objects.bulk_update(edited_posts, ["content"])
+
+
+def append_hashtags(content, names):
+    return " ".join([*filter(None, [content]), *(f"#{name}" for name in names)])
+
+
+def link_hashtags(Hashtag, PostHashtag, batch):
+    if not batch:
+        return
+
+    names = {name for _, name, _ in batch}
+    Hashtag.objects.bulk_create(
+        [Hashtag(name=name) for name in names], ignore_conflicts=True
+    )
+    ids = dict(Hashtag.objects.filter(name__in=names).values_list("name", "id"))
+    PostHashtag.objects.bulk_create(
+        [
+            PostHashtag(post_id=post_id, hashtag_id=ids[name], created_at=created_at)
+            for post_id, name, created_at in batch
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0004_post_comment_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PostHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="post_hashtags",
+                        to="post.hashtag",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="post_hashtags",
+                        to="post.post",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="hashtags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="posts",
+                through="post.PostHashtag",
+                to="post.hashtag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="posthashtag",
+            index=models.Index(
+                fields=["hashtag", "-created_at"], name="post_hashtag_created_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="posthashtag",
+            unique_together={("post", "hashtag")},
+        ),
+        migrations.RunPython(fill_hashtags, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="post",
+            name="hashtag",
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 18:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE TRIGGER post_search_vector_update
+BEFORE INSERT OR UPDATE OF content ON post_post
+FOR EACH ROW EXECUTE FUNCTION
+tsvector_update_trigger(search_vector, 'pg_catalog.english', content);
+
+UPDATE post_post
+SET search_vector = to_tsvector('pg_catalog.english', coalesce(content, ''));
+"""
+
+DROP_TRIGGER = "DROP TRIGGER IF EXISTS post_search_vector_update ON post_post;"
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0005_hashtag"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="post_search_vector_idx"
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import migrations
+
+# Own posts and those of push authors, the latest TIMELINE_BACKFILL_SIZE of
+# each, like rebuild_timeline(); existing rows are kept
+BACKFILL_SQL = """
+    INSERT INTO {timeline} (owner_id, post_id, created_at)
+    SELECT owners.id, latest.id, latest.created_at
+    FROM {user} owners
+    CROSS JOIN LATERAL (
+        SELECT owners.id AS author_id
+        UNION ALL
+        SELECT follows.user_id_id
+        FROM {following} follows
+        JOIN {user} authors ON authors.id = follows.user_id_id
+        WHERE follows.follower_id_id = owners.id
+        AND authors.followers_count <= %(fanout_limit)s
+    ) feed_authors
+    CROSS JOIN LATERAL (
+        SELECT posts.id, posts.created_at
+        FROM {post} posts
+        WHERE posts.author_id = feed_authors.author_id
+        ORDER BY posts.created_at DESC
+        LIMIT %(backfill_size)s
+    ) latest
+    WHERE owners.id > %(after_id)s AND owners.id <= %(last_id)s
+    ON CONFLICT (owner_id, post_id) DO NOTHING
+"""
+
+OWNERS_PER_BATCH = 1000
+
+
+def backfill_timelines(apps, schema_editor):
+    """Fill the timelines of users who existed before fan-out on write"""
+    User = apps.get_model("user", "User")
+    sql = BACKFILL_SQL.format(
+        timeline=apps.get_model("post", "TimelineEntry")._meta.db_table,
+        user=User._meta.db_table,
+        following=apps.get_model("user", "UserFollowing")._meta.db_table,
+        post=apps.get_model("post", "Post")._meta.db_table,
+    )
+    user_ids = User.objects.order_by("id").values_list("id", flat=True)
+
+    after_id = 0
+    while batch := list(user_ids.filter(id__gt=after_id)[:OWNERS_PER_BATCH]):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                {
+                    "fanout_limit": settings.TIMELINE_FANOUT_FOLLOWER_LIMIT,
+                    "backfill_size": settings.TIMELINE_BACKFILL_SIZE,
+                    "after_id": after_id,
+                    "last_id": batch[-1],
+                },
+            )
+        after_id = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own, an interrupted backfill resumes
+    # where ON CONFLICT skips the rows already written
+    atomic = False
+
+    dependencies = [
+        ("post", "0008_post_image_renditions"),
+        ("user", "0004_user_follow_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -2,17 +2,26 @@ import os
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.utils.text import slugify
+from django.db.models import F
 
 
 def post_image_file_path(instance, filename) -> str:
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(instance.title)}-{uuid.uuid4()}{extension}"
+    filename = f"post-{instance.author_id}-{uuid.uuid4()}{extension}"
 
     return os.path.join("uploads/post_images/", filename)
 
 
+class Hashtag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self) -> str:
+        return f"#{self.name}"
+
+
 class Post(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -21,22 +30,80 @@ class Post(models.Model):
     )
     content = models.TextField(null=True, blank=True)
     image = models.ImageField(null=True, blank=True, upload_to=post_image_file_path)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    hashtag = models.CharField(max_length=50, null=True, blank=True)
+    hashtags = models.ManyToManyField(
+        Hashtag,
+        through="PostHashtag",
+        related_name="posts",
+        blank=True,
+    )
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="post_author_created_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Post {self.id} by {self.author}"
 
-    @property
-    def count_likes(self) -> int:
-        return self.likes.count()
+    def save(self, *args, **kwargs) -> None:
+        """Write only the editable columns of an existing post.
+
+        Counters, renditions and the version are shifted by atomic UPDATEs
+        while the post is being edited, a full save of the loaded instance
+        would write their stale values back. The version is bumped in the
+        same UPDATE so an edit never reuses a cached version number.
+        """
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if field.editable and not field.primary_key
+            ]
+        kwargs["update_fields"] = {*update_fields, "version"}
+        self.version = F("version") + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
+
+class PostHashtag(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="post_hashtags"
+    )
+    hashtag = models.ForeignKey(
+        Hashtag,
+        on_delete=models.CASCADE,
+        related_name="post_hashtags"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("post", "hashtag")
+        indexes = [
+            models.Index(
+                fields=["hashtag", "-created_at"], name="post_hashtag_created_idx"
+            ),
+        ]
 
-    @property
-    def count_comments(self) -> int:
-        return self.comments.count()
+    def __str__(self) -> str:
+        return f"{self.hashtag} on post {self.post_id}"
 
 
 class Like(models.Model):
@@ -74,6 +141,40 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="comment_post_created_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} comments {self.post.id}"
+
+
+class TimelineEntry(models.Model):
+    """Precomputed home feed row: ``post`` is shown in ``owner``'s feed"""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("owner", "post")
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-post"],
+                name="timeline_owner_created_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Post {self.post_id} in timeline of {self.owner_id}"
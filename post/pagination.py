@@ -0,0 +1,33 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FeedCursorPagination(CursorPagination):
+    """Keyset pagination over the home timeline, newest posts first"""
+
+    ordering = ("-feed_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class CommentCursorPagination(CursorPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class LikeCursorPagination(CursorPagination):
+    ordering = "-id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class SearchCursorPagination(CursorPagination):
+    """Keyset pagination over search results, most relevant first"""
+
+    ordering = ("-rank", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
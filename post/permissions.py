@@ -1,6 +1,9 @@
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
+from post.models import Comment
+
 
 class IsAuthor(BasePermission):
     def has_object_permission(self, request, view, obj) -> bool:
-        return bool(obj.author == request.user)
+        author = obj.user if isinstance(obj, Comment) else obj.author
+        return bool(author == request.user)
@@ -0,0 +1,39 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, QuerySet, Value
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = "english"
+PREFIX_PATTERN = re.compile(r"(\w+)\*")
+
+
+def build_search_query(text: str) -> SearchQuery | None:
+    """Turn user input into a tsquery.
+
+    Plain words and "quoted phrases" follow websearch syntax, ``word*``
+    matches every lexeme starting with ``word``.
+    """
+    query = None
+    words = PREFIX_PATTERN.sub(" ", text).strip()
+    if words:
+        query = SearchQuery(words, search_type="websearch", config=SEARCH_CONFIG)
+
+    for prefix in PREFIX_PATTERN.findall(text):
+        prefix_query = SearchQuery(
+            f"{prefix}:*", search_type="raw", config=SEARCH_CONFIG
+        )
+        query = prefix_query if query is None else query & prefix_query
+
+    return query
+
+
+def search_posts(queryset: QuerySet, text: str) -> QuerySet:
+    """Filter posts matching the text through the GIN index, annotated by rank"""
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
@@ -1,19 +1,25 @@
 from rest_framework import serializers
 
 from post.models import Post, Like, Comment
+from social_media_api.images import list_image_url
 
 
 class PostSerializer(serializers.ModelSerializer):
-    model = Post
-    fields = (
-        "id",
-        "created_at",
-        "author",
-        "content",
-        "image",
-        "hashtag",
+    hashtags = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field="name"
     )
-    read_only_fields = ("id", "created_at", "author")
+
+    class Meta:
+        model = Post
+        fields = (
+            "id",
+            "created_at",
+            "author",
+            "content",
+            "image",
+            "hashtags",
+        )
+        read_only_fields = ("id", "created_at", "author")
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -30,21 +36,37 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class PostListSerializer(PostSerializer):
-    fields = (
-        "id",
-        "created_at",
-        "author",
-        "content",
-        "image",
-        "hashtag",
-        "count_likes",
-        "count_comments",
-    )
+    image = serializers.SerializerMethodField()
+    viewer_has_liked = serializers.BooleanField(read_only=True)
+    count_likes = serializers.IntegerField(source="likes_count", read_only=True)
+    count_comments = serializers.IntegerField(source="comments_count", read_only=True)
+    latest_comments = CommentSerializer(many=True, read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = (
+            "id",
+            "created_at",
+            "author",
+            "content",
+            "image",
+            "hashtags",
+            "count_likes",
+            "count_comments",
+            "latest_comments",
+            "viewer_has_liked",
+        )
+
+    def get_image(self, post: Post) -> str | None:
+        return list_image_url(
+            post.image, post.image_renditions, self.context.get("request")
+        )
 
 
 class PostDetailSerializer(PostSerializer):
-    likes = LikeSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    count_likes = serializers.IntegerField(source="likes_count", read_only=True)
+    count_comments = serializers.IntegerField(source="comments_count", read_only=True)
+    latest_comments = CommentSerializer(many=True, read_only=True)
+    viewer_has_liked = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Post
@@ -54,7 +76,36 @@ class PostDetailSerializer(PostSerializer):
             "author",
             "content",
             "image",
-            "hashtag",
-            "likes",
-            "comments",
+            "hashtags",
+            "count_likes",
+            "count_comments",
+            "latest_comments",
+            "viewer_has_liked",
         )
+
+
+class PostBulkLikeSerializer(serializers.Serializer):
+    like = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=500,
+    )
+    unlike = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=500,
+    )
+
+    def validate(self, attrs):
+        if set(attrs["like"]) & set(attrs["unlike"]):
+            raise serializers.ValidationError(
+                "A post can't be liked and unliked in the same request"
+            )
+        return attrs
+
+
+class PostBulkLikeResultSerializer(serializers.Serializer):
+    liked = serializers.ListField(child=serializers.IntegerField())
+    unliked = serializers.ListField(child=serializers.IntegerField())
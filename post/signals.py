@@ -0,0 +1,73 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue_on_commit
+from post import hashtags, timeline
+from social_media_api import images
+from post.models import Post, Like, Comment
+from user.models import UserFollowing
+
+
+def change_post_counter(post_id: int, field: str, delta: int) -> None:
+    """Atomically shift a denormalized counter column and bump the post version"""
+    Post.objects.filter(pk=post_id).update(
+        **{field: Greatest(F(field) + delta, 0)}, version=F("version") + 1
+    )
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs) -> None:
+    if created:
+        change_post_counter(instance.post_id, "likes_count", 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs) -> None:
+    change_post_counter(instance.post_id, "likes_count", -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs) -> None:
+    if created:
+        change_post_counter(instance.post_id, "comments_count", 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs) -> None:
+    change_post_counter(instance.post_id, "comments_count", -1)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs) -> None:
+    if update_fields is None or "content" in update_fields:
+        hashtags.sync_post_hashtags(instance, created)
+    if update_fields is None or "image" in update_fields:
+        images.sync_renditions(
+            instance, "image", "image_renditions", version_field="version"
+        )
+    if created:
+        timeline.add_to_author_timeline(instance)
+        enqueue_on_commit(timeline.fan_out_post, queue="timeline", post_id=instance.id)
+
+
+@receiver(post_save, sender=UserFollowing)
+def following_created(sender, instance, created, **kwargs) -> None:
+    if created:
+        enqueue_on_commit(
+            timeline.backfill_timeline,
+            queue="timeline",
+            owner_id=instance.follower_id_id,
+            author_id=instance.user_id_id,
+        )
+
+
+@receiver(post_delete, sender=UserFollowing)
+def following_deleted(sender, instance, **kwargs) -> None:
+    enqueue_on_commit(
+        timeline.prune_timeline,
+        queue="timeline",
+        owner_id=instance.follower_id_id,
+        author_id=instance.user_id_id,
+    )
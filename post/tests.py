@@ -1,3 +1,509 @@
-from django.test import TestCase
+import importlib
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from post import cache as post_cache
+from post import timeline
+from post.hashtags import sync_post_hashtags
+from post.models import Comment, Like, Post, TimelineEntry
+from post.serializers import PostSerializer
+from social_media_api import images
+from user.models import UserFollowing
+
+
+def create_user(email: str):
+    return get_user_model().objects.create_user(email=email, password="password")
+
+
+def detail_url(post_id: int) -> str:
+    return reverse("post:post-detail", args=[post_id])
+
+
+class PostEditTests(TestCase):
+    def setUp(self) -> None:
+        self.author = create_user("author@example.com")
+        self.reader = create_user("reader@example.com")
+        self.post = Post.objects.create(author=self.author, content="First")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def edit_during(self, side_effect, content: str = "Edited"):
+        """Patch the post while ``side_effect`` runs after it was loaded"""
+
+        def validate(serializer, attrs):
+            side_effect()
+            return attrs
+
+        with mock.patch.object(PostSerializer, "validate", validate):
+            return self.client.patch(detail_url(self.post.id), {"content": content})
+
+    def test_like_during_edit_is_kept(self) -> None:
+        response = self.edit_during(
+            lambda: Like.objects.create(post=self.post, user=self.reader)
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, "Edited")
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_comment_and_unlike_during_edit_are_kept(self) -> None:
+        like = Like.objects.create(post=self.post, user=self.reader)
+
+        def change_counters():
+            Comment.objects.create(post=self.post, user=self.reader, content="Hi")
+            like.delete()
+
+        self.edit_during(change_counters)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_full_save_of_loaded_post_keeps_counters(self) -> None:
+        loaded = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.reader)
+
+        loaded.content = "Saved"
+        loaded.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, "Saved")
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_edit_bumps_version_past_concurrent_changes(self) -> None:
+        def like_and_read():
+            Like.objects.create(post=self.post, user=self.reader)
+            self.client.get(detail_url(self.post.id))
+
+        self.edit_during(like_and_read)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 3)
+        response = self.client.get(detail_url(self.post.id))
+        self.assertEqual(response.data["content"], "Edited")
+
+    def test_save_reloads_bumped_version(self) -> None:
+        loaded = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.reader)
+
+        loaded.save(update_fields=["content"])
+
+        self.assertEqual(loaded.version, 3)
+
+
+@override_settings(POST_COMMENT_PREVIEW_SIZE=2)
+class CommentPreviewTests(TestCase):
+    def test_detail_prints_newest_comments_of_the_post(self) -> None:
+        author = create_user("author@example.com")
+        post = Post.objects.create(author=author, content="First")
+        other = Post.objects.create(author=author, content="Second")
+        comments = [
+            Comment.objects.create(post=post, user=author, content=str(number))
+            for number in range(4)
+        ]
+        Comment.objects.create(post=other, user=author, content="Other")
+        client = APIClient()
+        client.force_authenticate(author)
+
+        response = client.get(detail_url(post.id))
+
+        self.assertEqual(
+            [comment["id"] for comment in response.data["latest_comments"]],
+            [comments[3].id, comments[2].id],
+        )
+
+    def test_feed_prints_newest_comments_of_each_post(self) -> None:
+        author = create_user("author@example.com")
+        posts = [
+            Post.objects.create(author=author, content=str(number))
+            for number in range(2)
+        ]
+        comments = {
+            post.id: [
+                Comment.objects.create(post=post, user=author, content=str(number))
+                for number in range(3)
+            ]
+            for post in posts
+        }
+        client = APIClient()
+        client.force_authenticate(author)
+
+        response = client.get(reverse("post:post-list"))
+
+        self.assertEqual(
+            {
+                post["id"]: [comment["id"] for comment in post["latest_comments"]]
+                for post in response.data["results"]
+            },
+            {
+                post_id: [post_comments[2].id, post_comments[1].id]
+                for post_id, post_comments in comments.items()
+            },
+        )
+
+
+class HashtagMigrationTests(TransactionTestCase):
+    before = [("post", "0004_post_comment_keyset_indexes")]
+
+    def migrate(self, targets=None):
+        """Migrate to ``targets``, the latest migrations by default"""
+        executor = MigrationExecutor(connection)
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self) -> None:
+        self.migrate()
+
+    def test_legacy_tags_are_appended_to_content(self) -> None:
+        author = create_user("author@example.com")
+        OldPost = self.migrate(self.before).get_model("post", "Post")
+        post_id = OldPost.objects.create(
+            author_id=author.id, content="Trip #Travel", hashtag="#travel #Sea, food"
+        ).id
+        untagged_id = OldPost.objects.create(author_id=author.id, hashtag="beach").id
+
+        self.migrate()
+
+        post = Post.objects.get(pk=post_id)
+        self.assertEqual(post.content, "Trip #Travel #sea #food")
+        self.assertEqual(
+            set(post.hashtags.values_list("name", flat=True)),
+            {"travel", "sea", "food"},
+        )
+        untagged = Post.objects.get(pk=untagged_id)
+        self.assertEqual(untagged.content, "#beach")
+
+        # Migrated tags are in the content, syncing it keeps them
+        sync_post_hashtags(post)
+        self.assertEqual(post.hashtags.count(), 3)
+
+
+class PostSearchTests(TestCase):
+    url = reverse("post:post-search")
+
+    def setUp(self) -> None:
+        self.reader = create_user("reader@example.com")
+        self.followed = create_user("followed@example.com")
+        self.stranger = create_user("stranger@example.com")
+        follow(self.reader, self.followed)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def search(self, q: str) -> list[str]:
+        response = self.client.get(self.url, {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [post["content"] for post in response.data["results"]]
+
+    def test_visible_posts_ordered_by_rank(self) -> None:
+        Post.objects.create(author=self.followed, content="A beach day")
+        Post.objects.create(
+            author=self.reader, content="Beach, beach and more beaches"
+        )
+        Post.objects.create(author=self.followed, content="Mountains")
+        Post.objects.create(author=self.stranger, content="Hidden beach")
+
+        self.assertEqual(
+            self.search("beaches"), ["Beach, beach and more beaches", "A beach day"]
+        )
+
+    def test_phrases_exclusion_and_prefixes(self) -> None:
+        Post.objects.create(author=self.followed, content="Sunny day at the beach")
+        Post.objects.create(author=self.followed, content="A day, sunny later")
+        Post.objects.create(author=self.followed, content="Travelling by train")
+
+        self.assertEqual(self.search('"sunny day"'), ["Sunny day at the beach"])
+        self.assertEqual(self.search("sunny -beach"), ["A day, sunny later"])
+        self.assertEqual(self.search("trav*"), ["Travelling by train"])
+        self.assertEqual(self.search(""), [])
+
+
+class RebuildPostCountersTests(TestCase):
+    def test_reconcile_bumps_version_of_drifted_posts(self) -> None:
+        author = create_user("author@example.com")
+        drifted = Post.objects.create(author=author, content="Drifted")
+        exact = Post.objects.create(author=author, content="Exact")
+        Post.objects.filter(pk=drifted.pk).update(likes_count=7)
+
+        call_command("rebuild_post_counters", stdout=StringIO())
+
+        drifted.refresh_from_db()
+        exact.refresh_from_db()
+        self.assertEqual(drifted.likes_count, 0)
+        self.assertEqual(drifted.version, 2)
+        self.assertEqual(exact.version, 1)
+
+
+class PostDetailImageTests(TestCase):
+    @override_settings(ALLOWED_HOSTS=["one.example.com", "two.example.com"])
+    def test_cached_detail_gets_the_host_of_each_request(self) -> None:
+        author = create_user("author@example.com")
+        post = Post.objects.create(author=author, content="Photo")
+        Post.objects.filter(pk=post.pk).update(image="uploads/post_images/a.jpg")
+        client = APIClient()
+        client.force_authenticate(author)
+
+        first = client.get(detail_url(post.id), HTTP_HOST="one.example.com")
+        second = client.get(detail_url(post.id), HTTP_HOST="two.example.com")
+
+        url = "/media/uploads/post_images/a.jpg"
+        self.assertEqual(first.data["image"], f"http://one.example.com{url}")
+        self.assertEqual(second.data["image"], f"http://two.example.com{url}")
+        cached = post_cache.get_or_build_detail(post.id, 1, dict)
+        self.assertEqual(cached["image"], url)
+
+    def test_detail_without_image(self) -> None:
+        author = create_user("author@example.com")
+        post = Post.objects.create(author=author, content="Text")
+        client = APIClient()
+        client.force_authenticate(author)
+
+        self.assertIsNone(client.get(detail_url(post.id)).data["image"])
+
+
+class PostRenditionsTests(TestCase):
+    def test_built_renditions_bump_version(self) -> None:
+        author = create_user("author@example.com")
+        post = Post.objects.create(author=author, content="Photo")
+        Post.objects.filter(pk=post.pk).update(image="uploads/post_images/a.jpg")
+        renditions = {"source": "uploads/post_images/a.jpg", "320": "a-320.webp"}
+
+        with mock.patch.object(images, "render_renditions", return_value=renditions):
+            images.build_renditions(
+                "post.Post", post.pk, "image", "image_renditions", "version"
+            )
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_renditions, renditions)
+        self.assertEqual(post.version, 2)
+
+
+class BulkLikeTests(TestCase):
+    url = reverse("post:post-likes")
+
+    def setUp(self) -> None:
+        self.reader = create_user("reader@example.com")
+        self.followed = create_user("followed@example.com")
+        self.stranger = create_user("stranger@example.com")
+        follow(self.reader, self.followed)
+        self.posts = [
+            Post.objects.create(author=self.followed, content=str(number))
+            for number in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def bulk(self, like=(), unlike=()):
+        return self.client.post(
+            self.url, {"like": list(like), "unlike": list(unlike)}, format="json"
+        )
+
+    def assert_counters(self, post: Post, likes_count: int, version: int) -> None:
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.likes_count, post.version), (likes_count, version)
+        )
+        self.assertEqual(Like.objects.filter(post=post).count(), likes_count)
+
+    def test_like_and_unlike_in_one_request(self) -> None:
+        first, second, third = self.posts
+        Like.objects.create(post=second, user=self.reader)
+
+        response = self.bulk(like=[first.id, first.id, third.id], unlike=[second.id])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, {"liked": [first.id, third.id], "unliked": [second.id]}
+        )
+        self.assert_counters(first, 1, 2)
+        self.assert_counters(second, 0, 3)
+        self.assert_counters(third, 1, 2)
+
+    def test_replayed_batch_changes_nothing(self) -> None:
+        first, second, _ = self.posts
+        Like.objects.create(post=second, user=self.reader)
+        self.bulk(like=[first.id], unlike=[second.id])
+
+        response = self.bulk(like=[first.id], unlike=[second.id])
+
+        self.assertEqual(response.data, {"liked": [], "unliked": []})
+        self.assert_counters(first, 1, 2)
+        self.assert_counters(second, 0, 3)
+
+    def test_same_post_liked_and_unliked_is_rejected(self) -> None:
+        post = self.posts[0]
+
+        response = self.bulk(like=[post.id], unlike=[post.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.assert_counters(post, 0, 1)
+
+    def test_invisible_and_missing_posts_are_ignored(self) -> None:
+        hidden = Post.objects.create(author=self.stranger, content="Hidden")
+        Like.objects.create(post=hidden, user=self.reader)
+        missing_id = hidden.id + 1000
+
+        response = self.bulk(like=[missing_id, self.posts[0].id], unlike=[hidden.id])
+
+        self.assertEqual(
+            response.data, {"liked": [self.posts[0].id], "unliked": []}
+        )
+        self.assert_counters(hidden, 1, 2)
+        self.assertFalse(Like.objects.filter(post_id=missing_id).exists())
+
+
+class ConcurrentCounterTests(TransactionTestCase):
+    def test_concurrent_likes_comments_and_edits_keep_exact_counts(self) -> None:
+        author = create_user("author@example.com")
+        readers = [create_user(f"reader{number}@example.com") for number in range(8)]
+        post = Post.objects.create(author=author, content="First")
+        start = threading.Barrier(len(readers) + 1)
+
+        def react(reader):
+            try:
+                start.wait()
+                Like.objects.create(post=post, user=reader)
+                Comment.objects.create(post=post, user=reader, content="Hi")
+            finally:
+                connection.close()
+
+        def edit():
+            try:
+                start.wait()
+                for number in range(5):
+                    loaded = Post.objects.get(pk=post.pk)
+                    loaded.content = f"Edit {number}"
+                    loaded.save()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=react, args=[reader]) for reader in readers]
+        threads.append(threading.Thread(target=edit))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, len(readers))
+        self.assertEqual(post.comments_count, len(readers))
+        self.assertEqual(post.version, 1 + 2 * len(readers) + 5)
+
+
+def follow(follower, user) -> None:
+    UserFollowing.objects.create(user_id=user, follower_id=follower)
+
+
+def timeline_post_ids(owner) -> set[int]:
+    return set(
+        TimelineEntry.objects.filter(owner=owner).values_list("post_id", flat=True)
+    )
+
+
+@override_settings(TIMELINE_FANOUT_FOLLOWER_LIMIT=1, TIMELINE_BACKFILL_SIZE=2)
+class TimelineTests(TestCase):
+    def setUp(self) -> None:
+        self.author = create_user("author@example.com")
+        self.reader = create_user("reader@example.com")
+        self.other = create_user("other@example.com")
+
+    def test_fan_out_copies_post_to_followers(self) -> None:
+        follow(self.reader, self.author)
+        post = Post.objects.create(author=self.author, content="New")
+
+        timeline.fan_out_post(post.id)
+
+        self.assertEqual(timeline_post_ids(self.author), {post.id})
+        self.assertEqual(timeline_post_ids(self.reader), {post.id})
+        self.assertEqual(timeline_post_ids(self.other), set())
+
+    def test_fan_out_skips_pull_authors(self) -> None:
+        follow(self.reader, self.author)
+        follow(self.other, self.author)
+        post = Post.objects.create(author=self.author, content="New")
+
+        timeline.fan_out_post(post.id)
+
+        self.assertEqual(timeline_post_ids(self.reader), set())
+
+    def test_backfill_copies_latest_posts_of_followed_author(self) -> None:
+        posts = [
+            Post.objects.create(author=self.author, content=str(number))
+            for number in range(3)
+        ]
+        follow(self.reader, self.author)
+
+        timeline.backfill_timeline(self.reader.id, self.author.id)
+        # Only followers get a backfill
+        timeline.backfill_timeline(self.other.id, self.author.id)
+
+        self.assertEqual(timeline_post_ids(self.reader), {posts[1].id, posts[2].id})
+        self.assertEqual(timeline_post_ids(self.other), set())
+
+    def test_prune_drops_posts_of_unfollowed_author(self) -> None:
+        follow(self.reader, self.author)
+        follow(self.reader, self.other)
+        kept = Post.objects.create(author=self.other, content="Kept")
+        pruned = Post.objects.create(author=self.author, content="Pruned")
+        timeline.fan_out_post(kept.id)
+        timeline.fan_out_post(pruned.id)
+
+        timeline.prune_timeline(self.reader.id, self.author.id)
+
+        self.assertEqual(timeline_post_ids(self.reader), {kept.id})
+
+    def test_feed_reads_pull_authors_on_demand(self) -> None:
+        follow(self.reader, self.author)
+        follow(self.other, self.author)
+        own = Post.objects.create(author=self.reader, content="Own")
+        pulled = Post.objects.create(author=self.author, content="Pulled")
+        Post.objects.create(author=self.other, content="Not followed")
+
+        feed = list(timeline.feed_queryset(self.reader))
+
+        self.assertEqual([post.id for post in feed], [pulled.id, own.id])
+        self.assertEqual(feed[0].feed_at, pulled.created_at)
+
+    def test_feed_reads_only_timeline_without_pull_authors(self) -> None:
+        follow(self.reader, self.author)
+        post = Post.objects.create(author=self.author, content="Pushed")
+        Post.objects.create(author=self.other, content="Not followed")
+        timeline.fan_out_post(post.id)
+
+        self.assertEqual(
+            [post.id for post in timeline.feed_queryset(self.reader)], [post.id]
+        )
+
+    def test_migration_backfills_existing_timelines(self) -> None:
+        backfill = importlib.import_module(
+            "post.migrations.0009_backfill_timelines"
+        ).backfill_timelines
+        follow(self.reader, self.author)
+        posts = [
+            Post.objects.create(author=self.author, content=str(number))
+            for number in range(3)
+        ]
+        own = Post.objects.create(author=self.reader, content="Own")
+        TimelineEntry.objects.all().delete()
+
+        backfill(apps, SimpleNamespace(connection=connection))
+        backfill(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(
+            timeline_post_ids(self.reader), {posts[1].id, posts[2].id, own.id}
+        )
+        self.assertEqual(
+            timeline_post_ids(self.author), {posts[1].id, posts[2].id}
+        )
@@ -0,0 +1,124 @@
+from itertools import islice
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+
+from jobs.queue import task
+from post.models import Post, TimelineEntry
+from user import graph
+from user.models import UserFollowing
+
+
+def is_pull_author(author) -> bool:
+    """Authors above the follower limit are read on demand, not fanned out"""
+    return author.followers_count > settings.TIMELINE_FANOUT_FOLLOWER_LIMIT
+
+
+def write_entries(entries: Iterable[TimelineEntry]) -> None:
+    entries = iter(entries)
+    while batch := list(islice(entries, settings.TIMELINE_BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def add_to_author_timeline(post: Post) -> None:
+    """Show a new post to its author right away, followers get it from a job"""
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=post.author_id, post=post, created_at=post.created_at)],
+        ignore_conflicts=True,
+    )
+
+
+@task
+def fan_out_post(post_id: int) -> None:
+    """Copy a new post into the timelines of its author's followers"""
+    post = Post.objects.select_related("author").filter(pk=post_id).first()
+    if post is None or is_pull_author(post.author):
+        return
+
+    follower_ids = UserFollowing.objects.filter(user_id=post.author_id).values_list(
+        "follower_id", flat=True
+    )
+    with transaction.atomic():
+        write_entries(
+            TimelineEntry(owner_id=owner_id, post=post, created_at=post.created_at)
+            for owner_id in follower_ids.iterator(
+                chunk_size=settings.TIMELINE_BATCH_SIZE
+            )
+        )
+
+
+def copy_author_posts(owner_id: int, author_id: int) -> None:
+    posts = Post.objects.filter(author_id=author_id).values_list("id", "created_at")
+    write_entries(
+        TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts[: settings.TIMELINE_BACKFILL_SIZE]
+    )
+
+
+@task
+def backfill_timeline(owner_id: int, author_id: int) -> None:
+    """Add the latest posts of a newly followed author to a timeline"""
+    author = (
+        get_user_model()
+        .objects.filter(pk=author_id, followers__follower_id=owner_id)
+        .only("followers_count")
+        .first()
+    )
+    if author is not None and not is_pull_author(author):
+        copy_author_posts(owner_id, author_id)
+
+
+def rebuild_timeline(user) -> None:
+    """Recreate a timeline from the user's own posts and their followings"""
+    push_author_ids = (
+        get_user_model()
+        .objects.filter(
+            followers__follower_id=user,
+            followers_count__lte=settings.TIMELINE_FANOUT_FOLLOWER_LIMIT,
+        )
+        .values_list("id", flat=True)
+    )
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(owner=user).delete()
+        for author_id in [user.id, *push_author_ids]:
+            copy_author_posts(user.id, author_id)
+
+
+@task
+def prune_timeline(owner_id: int, author_id: int) -> None:
+    """Drop the posts of an unfollowed author from a timeline"""
+    TimelineEntry.objects.filter(owner_id=owner_id, post__author_id=author_id).delete()
+
+
+def feed_queryset(user) -> QuerySet:
+    """Posts of the user's home feed annotated with their ``feed_at`` position"""
+    pull_author_ids = list(
+        get_user_model()
+        .objects.filter(
+            id__in=graph.followings_of(user),
+            followers_count__gt=settings.TIMELINE_FANOUT_FOLLOWER_LIMIT,
+        )
+        .values_list("id", flat=True)
+    )
+
+    if not pull_author_ids:
+        return (
+            Post.objects.filter(timeline_entries__owner=user)
+            .defer("search_vector")
+            .annotate(feed_at=F("timeline_entries__created_at"))
+            .order_by("-feed_at", "-id")
+        )
+
+    return (
+        Post.objects.filter(
+            Q(id__in=TimelineEntry.objects.filter(owner=user).values("post_id"))
+            | Q(author_id__in=pull_author_ids)
+        )
+        .defer("search_vector")
+        .annotate(feed_at=F("created_at"))
+        .order_by("-feed_at", "-id")
+    )
@@ -1,12 +1,17 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from post.views import PostViewSet, CommentViewSet
+from post.views import PostViewSet, CommentViewSet, LikeViewSet
 
 router = routers.DefaultRouter()
 router.register("", PostViewSet, basename="post")
 
 urlpatterns = [
+    path(
+        "<int:post_id>/likes/",
+        LikeViewSet.as_view(actions={"get": "list"}),
+        name="like-list",
+    ),
     path(
         "<int:post_id>/comments/",
         CommentViewSet.as_view(actions={"get": "list", "post": "create"}),
@@ -17,6 +22,7 @@ urlpatterns = [
         CommentViewSet.as_view(actions={"get": "retrieve", "delete": "destroy"}),
         name="comment-detail",
     ),
-] + path("", include(router.urls))
+    path("", include(router.urls)),
+]
 
 app_name = "post"
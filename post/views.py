@@ -1,56 +1,169 @@
 from typing import Type
 
-from django.db.models import Q, QuerySet
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet, prefetch_related_objects
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 
+from post import cache as post_cache
+from post import timeline
+from post.comments import latest_comments_prefetch
+from post.hashtags import normalize_hashtag
+from post.likes import apply_likes
 from post.permissions import IsAuthor
 from post.models import Post, Like, Comment
+from post.pagination import (
+    FeedCursorPagination,
+    CommentCursorPagination,
+    LikeCursorPagination,
+    SearchCursorPagination,
+)
+from post.search import search_posts
 from post.serializers import (
     PostListSerializer,
     PostDetailSerializer,
     PostSerializer,
     LikeSerializer,
-    CommentSerializer
+    CommentSerializer,
+    PostBulkLikeSerializer,
+    PostBulkLikeResultSerializer,
 )
+from social_media_api.conditional import add_validators, make_etag, not_modified
+from social_media_api.db.router import ReplicaReadsMixin
+from user import graph
+
+
+def annotate_viewer_has_liked(queryset: QuerySet, user) -> QuerySet:
+    return queryset.annotate(
+        viewer_has_liked=Exists(Like.objects.filter(post=OuterRef("pk"), user=user))
+    )
+
+
+def feed_posts(user, hashtag: str | None = None) -> QuerySet:
+    """Home feed of a user, optionally narrowed to one hashtag"""
+    queryset = annotate_viewer_has_liked(timeline.feed_queryset(user), user)
+    if hashtag:
+        queryset = queryset.filter(hashtags__name=normalize_hashtag(hashtag))
+    return queryset
+
+
+def feed_page_etag(request, page: list[Post], paginator) -> str:
+    """ETag of a feed page from its posts, their versions and like state.
+
+    Likes, comments and edits bump a post's version, a new timeline entry
+    changes the rows of the first page, so the body never has to be rendered.
+    """
+    return make_etag(
+        request.build_absolute_uri(),
+        paginator.get_next_link(),
+        paginator.get_previous_link(),
+        [(post.id, post.version, post.viewer_has_liked) for post in page],
+    )
+
+
+def post_detail_etag(post_id: int, version: int, viewer_has_liked: bool) -> str:
+    return make_etag("post", post_id, version, viewer_has_liked)
+
+
+def build_detail_data(post_id: int) -> dict:
+    """Detail payload shared by every viewer, with a relative image URL.
+
+    The payload is cached, an absolute URL would carry the host of the
+    request that happened to build it.
+    """
+    post = (
+        Post.objects.defer("search_vector")
+        .prefetch_related("hashtags", latest_comments_prefetch())
+        .get(pk=post_id)
+    )
+    return PostDetailSerializer(post).data
+
 
+def detail_response_data(request, data: dict, viewer_has_liked: bool) -> dict:
+    """Cached detail payload completed for the requesting viewer and host"""
+    image = data["image"]
+    return {
+        **data,
+        "image": image and request.build_absolute_uri(image),
+        "viewer_has_liked": viewer_has_liked,
+    }
 
-class PostViewSet(viewsets.ModelViewSet):
+
+class PostViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
+    pagination_class = FeedCursorPagination
 
     def get_queryset(self) -> QuerySet:
-        queryset = Post.objects.prefetch_related("likes", "comments")
-        if self.action in ("retrieve", "like", "unlike"):
-            queryset = queryset.filter(
-                Q(author=self.request.user)
-                | Q(author__id__in=self.request.user.followings.values("user_id"))
+        if self.action == "list":
+            return feed_posts(
+                self.request.user, self.request.query_params.get("hashtag")
             )
 
-            hashtag = self.request.query_params.get("hashtag")
-            if hashtag:
-                queryset = queryset.filter(hashtag__icontains=hashtag)
+        queryset = Post.objects.defer("search_vector")
+        if self.action == "search":
+            queryset = annotate_viewer_has_liked(
+                queryset.prefetch_related("hashtags", latest_comments_prefetch()),
+                self.request.user,
+            )
+
+        if self.action in ("retrieve", "like", "unlike", "search", "likes"):
+            queryset = queryset.filter(
+                author_id__in=graph.visible_author_ids(self.request.user)
+            )
 
         return queryset
 
     def get_serializer_class(self) -> Type[
         PostListSerializer | PostDetailSerializer | LikeSerializer | PostSerializer
         ]:
-        if self.action == "list":
+        if self.action in ("list", "search"):
             return PostListSerializer
 
         if self.action == "retrieve":
             return PostDetailSerializer
         if self.action == "like":
             return LikeSerializer
+        if self.action == "likes":
+            return PostBulkLikeSerializer
 
         return PostSerializer
 
     def perform_create(self, serializer) -> None:
         serializer.save(author=self.request.user)
 
+    def perform_update(self, serializer) -> None:
+        # The new version only becomes visible together with its hashtags
+        with transaction.atomic():
+            serializer.save()
+
+    def get_detail_data(self, post_id: int, version: int) -> dict:
+        """Detail payload of a post version, served from the cache"""
+        return post_cache.get_or_build_detail(
+            post_id, version, lambda: build_detail_data(post_id)
+        )
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        post_id, version, viewer_has_liked = get_object_or_404(
+            annotate_viewer_has_liked(
+                self.get_queryset(), self.request.user
+            ).values_list("id", "version", "viewer_has_liked"),
+            pk=self.kwargs["pk"],
+        )
+        etag = post_detail_etag(post_id, version, viewer_has_liked)
+        if response := not_modified(request, etag):
+            return response
+
+        response = Response(
+            detail_response_data(
+                request, self.get_detail_data(post_id, version), viewer_has_liked
+            ),
+            status=status.HTTP_200_OK,
+        )
+        return add_validators(response, etag)
+
     def get_permissions(self) -> list[BasePermission]:
         if self.action in ("update", "partial_update", "destroy"):
             return [IsAuthor()]
@@ -72,9 +185,15 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data={"post": post.id, "user": user.id})
 
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return_serializer = PostDetailSerializer(self.get_object())
-        return Response(return_serializer.errors, status=status.HTTP_200_OK)
+        with transaction.atomic():
+            serializer.save()
+        post.refresh_from_db(fields=["version"])
+        return Response(
+            detail_response_data(
+                request, self.get_detail_data(post.id, post.version), True
+            ),
+            status=status.HTTP_200_OK,
+        )
 
     @extend_schema(
         methods=["POST"], request=None, responses={200: PostDetailSerializer}
@@ -89,25 +208,112 @@ class PostViewSet(viewsets.ModelViewSet):
         """Endpoint for post unlike. Returns the post detail"""
         post = self.get_object()
         user = self.request.user
-        Like.objects.filter(post_id=post.id, user__id=user.id).delete()
+        with transaction.atomic():
+            Like.objects.filter(post_id=post.id, user__id=user.id).delete()
 
-        return_serializer = PostDetailSerializer(self.get_object())
-        return Response(return_serializer.errors, status=status.HTTP_200_OK)
+        post.refresh_from_db(fields=["version"])
+        return Response(
+            detail_response_data(
+                request, self.get_detail_data(post.id, post.version), False
+            ),
+            status=status.HTTP_200_OK,
+        )
+
+    @extend_schema(
+        methods=["POST"],
+        request=PostBulkLikeSerializer,
+        responses={200: PostBulkLikeResultSerializer},
+    )
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="likes",
+        permission_classes=[IsAuthenticated],
+    )
+    def likes(self, request) -> Response:
+        """Endpoint for bulk like/unlike. Returns the ids whose like state changed"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        like_ids = list(dict.fromkeys(serializer.validated_data["like"]))
+        unlike_ids = list(dict.fromkeys(serializer.validated_data["unlike"]))
+        visible = set(
+            self.get_queryset()
+            .filter(id__in=like_ids + unlike_ids)
+            .values_list("id", flat=True)
+        )
+        result = apply_likes(
+            self.request.user.id,
+            [post_id for post_id in like_ids if post_id in visible],
+            [post_id for post_id in unlike_ids if post_id in visible],
+        )
+        return Response(
+            PostBulkLikeResultSerializer(result).data, status=status.HTTP_200_OK
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                description=(
+                    "Full-text query, supports \"phrases\", -exclusion "
+                    "and prefix* terms (ex. ?q=\"sunny day\" beach trav*)"
+                ),
+            ),
+        ],
+        responses={200: PostListSerializer(many=True)},
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="search",
+        permission_classes=[IsAuthenticated],
+        pagination_class=SearchCursorPagination,
+    )
+    def search(self, request) -> Response:
+        """Endpoint for full-text post search. Returns posts ordered by relevance"""
+        queryset = search_posts(
+            self.get_queryset(), self.request.query_params.get("q", "")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "hashtag",
                 type=str,
-                description="Filter posts by hashtag",
+                description="Filter posts by hashtag (ex. ?hashtag=travel)",
             ),
         ]
     )
-    def list(self, request, *args, **kwargs) -> QuerySet:
-        return super().list(request, *args, **kwargs)
+    def list(self, request, *args, **kwargs) -> Response:
+        page = self.paginate_queryset(self.get_queryset())
+        etag = feed_page_etag(request, page, self.paginator)
+        if response := not_modified(request, etag):
+            return response
+
+        prefetch_related_objects(page, "hashtags", latest_comments_prefetch())
+        serializer = self.get_serializer(page, many=True)
+        return add_validators(self.get_paginated_response(serializer.data), etag)
+
+
+class LikeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = LikeSerializer
+    pagination_class = LikeCursorPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet:
+        return Like.objects.filter(
+            post__author_id__in=graph.visible_author_ids(self.request.user),
+            post_id=self.kwargs.get("post_id"),
+        )
 
 
 class CommentViewSet(
+    ReplicaReadsMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
@@ -115,16 +321,18 @@ class CommentViewSet(
     viewsets.GenericViewSet,
 ):
     serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
     lookup_field = "id"
 
     def perform_create(self, serializer) -> None:
         post = get_object_or_404(Post, pk=self.kwargs.get("post_id"))
-        serializer.save(user=self.request.user, post=post)
+        with transaction.atomic():
+            serializer.save(user=self.request.user, post=post)
 
     def get_queryset(self) -> QuerySet:
-        return Comment.objects.select_related("author", "post").filter(
-            Q(post__author=self.request.user)
-            | Q(post__author_id__in=self.request.user.followings.values("user_id"))
+        return Comment.objects.select_related("user", "post").filter(
+            post__author_id__in=graph.visible_author_ids(self.request.user),
+            post_id=self.kwargs.get("post_id"),
         )
 
     def get_permissions(self) -> list[BasePermission]:
@@ -0,0 +1,168 @@
+"""Helpers for the async (ASGI) views of the read-heavy endpoints"""
+import asyncio
+from functools import partial, wraps
+from typing import AsyncIterator, Callable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connections
+from django.db.models import Model, prefetch_related_objects
+from django.http import HttpResponse, HttpResponseBase
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from social_media_api.db.pool import PoolExhausted, checkout_nowait
+from social_media_api.db.router import route_reads
+
+
+def in_own_connection(func: Callable) -> Callable:
+    """Run a blocking call on the worker thread's own database connection.
+
+    The connection is checked out without waiting, PoolExhausted is raised
+    when the pool has none free, and handed back whatever the call raised.
+    """
+
+    @wraps(func)
+    def call():
+        close_old_connections()
+        token = checkout_nowait.set(True)
+        try:
+            return func()
+        finally:
+            checkout_nowait.reset(token)
+            connections.close_all()
+
+    return call
+
+
+async def run_concurrently(call: Callable):
+    try:
+        return await sync_to_async(in_own_connection(call), thread_sensitive=False)()
+    except PoolExhausted:
+        # Every pooled connection is taken, run on the request's own instead
+        return await sync_to_async(call)()
+
+
+async def gather_queries(*calls: Callable) -> list:
+    """Run independent blocking reads at the same time.
+
+    Django's async ORM runs every query of a request on one thread, one after
+    another. Here each call gets a worker thread, and so a connection, of its
+    own, which keeps the event loop free while the queries overlap. A call
+    that finds no free pooled connection runs again on the request's own
+    connection, so calls must be reads that are safe to repeat.
+    """
+    return await asyncio.gather(*(run_concurrently(call) for call in calls))
+
+
+async def prefetch_concurrently(instances: list[Model], *lookups) -> None:
+    """prefetch_related_objects() with every lookup fetched concurrently"""
+    for instance in instances:
+        # Created up front so the threads never race to create it
+        instance.__dict__.setdefault("_prefetched_objects_cache", {})
+
+    await gather_queries(
+        *(partial(prefetch_related_objects, instances, lookup) for lookup in lookups)
+    )
+
+
+async def iterate_in_thread(iterator: Iterator) -> AsyncIterator:
+    """Async iterator over a blocking one, advanced on the request's thread.
+
+    All steps run on one thread, so a server-side cursor keeps its
+    connection, and the iterator is closed if the client goes away.
+    """
+    done = object()
+    try:
+        while (item := await sync_to_async(next)(iterator, done)) is not done:
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_content(request, iterator: Iterator):
+    """Content for a StreamingHttpResponse that streams under ASGI too.
+
+    Django reads a blocking iterator into a list before sending it over ASGI,
+    an async one is sent chunk by chunk.
+    """
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        return iterate_in_thread(iterator)
+    return iterator
+
+
+def json_response(data, status: int = 200, headers: dict | None = None) -> HttpResponse:
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+def error_response(request: Request, exc: APIException) -> HttpResponse:
+    """Same body and headers as DRF's default exception handler"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    headers = {}
+    if exc.status_code == 401 and request.authenticators:
+        headers["WWW-Authenticate"] = request.authenticators[0].authenticate_header(
+            request
+        )
+    return json_response(data, exc.status_code, headers)
+
+
+def authenticate(request: Request):
+    """Authenticate a request, then send its reads to a replica if possible"""
+    user = request.user
+    if not user.is_authenticated:
+        raise NotAuthenticated
+    route_reads(user)
+    return user
+
+
+def async_api_view(view: Callable) -> Callable:
+    """Serve a read-only coroutine with the API's authentication and errors.
+
+    The view receives an authenticated DRF request and returns the response
+    data, or a response of its own. Authentication may read the database, so
+    it runs in a thread.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs) -> HttpResponse:
+        request = Request(
+            request,
+            authenticators=[
+                authenticator()
+                for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ],
+        )
+        try:
+            await sync_to_async(authenticate)(request)
+            data = await view(request, *args, **kwargs)
+        except APIException as exc:
+            return error_response(request, exc)
+        if isinstance(data, HttpResponseBase):
+            return data
+        return json_response(data)
+
+    return wrapper
+
+
+def async_route(async_view: Callable, sync_view: Callable) -> Callable:
+    """Serve GET from an async view and every other method from a DRF view"""
+    sync_view_in_thread = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs) -> HttpResponse:
+        if request.method in ("GET", "HEAD"):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view_in_thread(request, *args, **kwargs)
+
+    # Token authenticated like the DRF views, and labelled like them in metrics
+    view.csrf_exempt = True
+    view.cls = sync_view.cls
+    view.actions = sync_view.actions
+    return view
@@ -0,0 +1,54 @@
+"""Conditional GET for API responses, checked before the body is built.
+
+Validators come from data the view reads anyway (post versions, the rows of
+a feed page, profile timestamps), so a revalidation that matches answers
+304 without running the remaining queries or the serializer.
+"""
+import hashlib
+from datetime import datetime
+
+from django.http import HttpResponseBase
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag of the values a response body is derived from"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def not_modified(
+    request, etag: str | None = None, last_modified: datetime | None = None
+) -> HttpResponseBase | None:
+    """304 response when the client's copy is still current, None otherwise"""
+    if request.method not in ("GET", "HEAD"):
+        return None
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        add_validators(response, etag, last_modified)
+    return response
+
+
+def add_validators(
+    response: HttpResponseBase,
+    etag: str | None = None,
+    last_modified: datetime | None = None,
+) -> HttpResponseBase:
+    """Set the validators and make clients revalidate their private copy"""
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+
+from social_media_api.db.creation import DatabaseCreation
+from social_media_api.db.pool import ConnectionPool, get_pool
+
+# Same value in psycopg2 and psycopg: no transaction is open
+TRANSACTION_STATUS_IDLE = 0
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend checking connections out of a per-process pool.
+
+    Enabled by a POOL entry in the database settings. Closing a connection,
+    which Django does at the end of every request with CONN_MAX_AGE = 0,
+    hands it back to the pool instead of disconnecting.
+    """
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool: ConnectionPool | None = None
+
+    def get_pool(self, conn_params: dict) -> ConnectionPool | None:
+        options = self.settings_dict.get("POOL")
+        if self.alias == NO_DB_ALIAS or not options or not options["MAX_SIZE"]:
+            return None
+        key = (self.alias, repr(sorted(conn_params.items())))
+        return get_pool(key, self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        connection = pool.acquire(partial(super().get_new_connection, conn_params))
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            # Closed inside atomic(), the wrapper still points at the connection
+            reuse = not self.in_atomic_block and self.reset_connection()
+            pool.release(self.connection, reuse)
+
+    def reset_connection(self) -> bool:
+        """Roll back what the request left open, False if that is impossible"""
+        if self.connection.closed:
+            return False
+        try:
+            if self.connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                self.connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
@@ -0,0 +1,183 @@
+"""Per-process pools of database connections, shared by a worker's threads.
+
+Opening a PostgreSQL connection costs a few round trips and a backend
+process. Pooled connections are opened once and handed from request to
+request, so threads that come and go (ASGI requests, sync_to_async workers)
+no longer pay for it.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable
+
+from django.db.utils import OperationalError
+
+from social_media_api import metrics
+
+# Set while a request opens extra connections for concurrent queries: those
+# checkouts must not wait, the request already holds a connection and
+# requests waiting on each other's extra ones would deadlock the pool
+checkout_nowait: ContextVar[bool] = ContextVar("checkout_nowait", default=False)
+
+
+class PoolExhausted(OperationalError):
+    """No free connection for a checkout that must not wait"""
+
+
+def close_quietly(connection) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """At most max_size connections of one database, idle ones reused LIFO.
+
+    A connection idle for longer than check_after seconds is pinged with
+    SELECT 1 when checked out and replaced if broken. Connections idle for
+    longer than max_idle seconds are closed so the server can reclaim them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        timeout: float,
+        max_idle: float,
+        check_after: float,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.idle: list[tuple[object, float]] = []
+        self.in_use = 0
+
+    def acquire(self, connect: Callable):
+        """Check out a healthy connection, opening one with connect() if none idle"""
+        if checkout_nowait.get():
+            if not self.slots.acquire(blocking=False):
+                raise PoolExhausted(f"No free connection in the {self.name} pool")
+            return self.checkout(connect)
+
+        start = time.monotonic()
+        acquired = self.slots.acquire(timeout=self.timeout)
+        metrics.observe_pool_wait(self.name, time.monotonic() - start, acquired)
+        if not acquired:
+            raise OperationalError(
+                f"No free connection in the {self.name} pool after {self.timeout}s"
+            )
+        return self.checkout(connect)
+
+    def checkout(self, connect: Callable):
+        """Hand out a connection for a slot the caller has acquired"""
+        try:
+            connection = self.take_idle()
+            if connection is None:
+                connection = connect()
+                metrics.observe_connection_opened(self.name)
+        except BaseException:
+            self.slots.release()
+            raise
+
+        with self.lock:
+            self.in_use += 1
+        self.report()
+        return connection
+
+    def take_idle(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, idle_since = self.idle.pop()
+
+            idle_for = time.monotonic() - idle_since
+            if idle_for < self.max_idle and self.is_healthy(connection, idle_for):
+                return connection
+            close_quietly(connection)
+
+    def is_healthy(self, connection, idle_for: float) -> bool:
+        if connection.closed:
+            return False
+        if idle_for < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection, reuse: bool = True) -> None:
+        """Return a checked out connection, closing it unless reuse is set"""
+        try:
+            if reuse and not connection.closed:
+                with self.lock:
+                    now = time.monotonic()
+                    self.idle.append((connection, now))
+                    # Oldest first, so the expired connections are a prefix
+                    stale = 0
+                    while (
+                        stale < len(self.idle) - 1
+                        and now - self.idle[stale][1] >= self.max_idle
+                    ):
+                        stale += 1
+                    expired, self.idle = self.idle[:stale], self.idle[stale:]
+                for idle_connection, _ in expired:
+                    close_quietly(idle_connection)
+            else:
+                close_quietly(connection)
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+            self.report()
+
+    def close_idle(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            close_quietly(connection)
+        self.report()
+
+    def report(self) -> None:
+        metrics.observe_pool_size(self.name, len(self.idle), self.in_use)
+
+
+pools: dict[tuple, ConnectionPool] = {}
+pools_pid = os.getpid()
+pools_lock = threading.Lock()
+# Pools inherited over fork(), kept referenced: closing, or garbage collecting,
+# their connections would terminate the sessions the parent process still uses
+inherited: list[dict] = []
+
+
+def get_pool(key: tuple, name: str, options: dict) -> ConnectionPool:
+    """The pool of this process for a set of connection parameters"""
+    global pools, pools_pid
+    with pools_lock:
+        if pools_pid != os.getpid():
+            inherited.append(pools)
+            pools, pools_pid = {}, os.getpid()
+
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                name,
+                max_size=options["MAX_SIZE"],
+                timeout=options["TIMEOUT"],
+                max_idle=options["MAX_IDLE"],
+                check_after=options["CHECK_AFTER"],
+            )
+        return pools[key]
+
+
+def close_idle_connections() -> None:
+    with pools_lock:
+        current = list(pools.values()) if pools_pid == os.getpid() else []
+    for pool in current:
+        pool.close_idle()
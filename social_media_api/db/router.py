@@ -0,0 +1,136 @@
+"""Read replica routing with read-your-writes stickiness.
+
+Reads go to the primary unless a request opted in with route_reads(): safe
+method requests of the views using ReplicaReadsMixin, and the async views.
+A user who just wrote something reads from the primary for
+DATABASE_REPLICA_STICKY_SECONDS, so they see their own like, comment or
+follow even while the replicas catch up. Replicas lagging more than
+DATABASE_REPLICA_MAX_LAG seconds, or unreachable, are skipped.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from social_media_api import metrics
+
+logger = logging.getLogger(__name__)
+
+read_database: ContextVar[str | None] = ContextVar("read_database", default=None)
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request, if any"""
+
+    def db_for_read(self, model, **hints) -> str | None:
+        return read_database.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        return db not in settings.DATABASE_REPLICAS
+
+
+def sticky_cache_key(user_id: int) -> str:
+    return f"db:primary:{user_id}"
+
+
+def stick_to_primary(user_id: int) -> None:
+    """Serve a user's reads from the primary for a while after they wrote"""
+    if settings.DATABASE_REPLICAS:
+        cache.set(
+            sticky_cache_key(user_id), 1, settings.DATABASE_REPLICA_STICKY_SECONDS
+        )
+
+
+def is_sticky(user_id: int) -> bool:
+    return cache.get(sticky_cache_key(user_id)) is not None
+
+
+def measure_lag(alias: str) -> float | None:
+    """Replication lag of a replica in seconds, None if it cannot be reached"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning("Replica %s is unreachable", alias, exc_info=True)
+        connection.close()
+        return None
+
+
+replica_lag: dict[str, float | None] = {}
+lag_checked_at: dict[str, float] = {}
+lag_lock = threading.Lock()
+
+
+def healthy_replicas() -> list[str]:
+    """Replicas within DATABASE_REPLICA_MAX_LAG, rechecked every interval"""
+    now = time.monotonic()
+    with lag_lock:
+        due = [
+            alias
+            for alias in settings.DATABASE_REPLICAS
+            if now - lag_checked_at.get(alias, float("-inf"))
+            >= settings.DATABASE_REPLICA_CHECK_INTERVAL
+        ]
+        # Claimed under the lock so one thread per process checks a replica
+        lag_checked_at.update(dict.fromkeys(due, now))
+
+    for alias in due:
+        lag = replica_lag[alias] = measure_lag(alias)
+        metrics.observe_replica_lag(alias, lag)
+
+    return [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if replica_lag.get(alias) is not None
+        and replica_lag[alias] <= settings.DATABASE_REPLICA_MAX_LAG
+    ]
+
+
+def route_reads(user) -> str | None:
+    """Pick the database serving the reads of the current request"""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if user.is_authenticated and is_sticky(user.pk):
+        return None
+
+    replicas = healthy_replicas()
+    alias = random.choice(replicas) if replicas else None
+    read_database.set(alias)
+    return alias
+
+
+class ReplicaReadsMixin:
+    """Serve the reads of safe method requests from a replica.
+
+    Routed once the request is authenticated, so authentication itself and
+    every write request keep reading from the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            route_reads(request.user)
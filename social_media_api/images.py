@@ -0,0 +1,116 @@
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models import F
+from PIL import Image, ImageOps, features
+
+from jobs.queue import enqueue_on_commit, task
+
+
+def rendition_format() -> tuple[str, str]:
+    if features.check("webp"):
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def render_renditions(name: str) -> dict[str, str]:
+    """Store width-bounded, metadata-free copies of an uploaded image.
+
+    Returns the storage names of the copies keyed by width, plus the name
+    of the source they were rendered from.
+    """
+    image_format, extension = rendition_format()
+    directory, filename = os.path.split(os.path.splitext(name)[0])
+    renditions = {"source": name}
+
+    with default_storage.open(name) as source, Image.open(source) as original:
+        icc_profile = original.info.get("icc_profile")
+        image = ImageOps.exif_transpose(original)
+        if image_format == "JPEG" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+
+        for width in settings.IMAGE_RENDITION_WIDTHS:
+            rendition = image.copy()
+            rendition.thumbnail((width, image.height))
+
+            buffer = BytesIO()
+            rendition.save(
+                buffer,
+                image_format,
+                quality=settings.IMAGE_RENDITION_QUALITY,
+                icc_profile=icc_profile,
+            )
+            renditions[str(width)] = default_storage.save(
+                os.path.join(directory, "renditions", f"{filename}-{width}{extension}"),
+                ContentFile(buffer.getvalue()),
+            )
+
+    return renditions
+
+
+@task
+def build_renditions(
+    model: str,
+    pk: int,
+    field_name: str,
+    renditions_field: str,
+    version_field: str | None = None,
+) -> None:
+    model = apps.get_model(model)
+    name = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+    if not name:
+        return
+
+    renditions = render_renditions(name)
+    changes = {renditions_field: renditions}
+    if version_field:
+        # Validators built from the version must change with the image URLs
+        changes[version_field] = F(version_field) + 1
+    model.objects.filter(pk=pk, **{field_name: name}).update(**changes)
+
+
+def sync_renditions(
+    instance: models.Model,
+    field_name: str,
+    renditions_field: str,
+    version_field: str | None = None,
+) -> None:
+    """Enqueue renditions of a new image once the transaction commits"""
+    image = getattr(instance, field_name)
+    renditions = getattr(instance, renditions_field) or {}
+
+    if not image:
+        if renditions:
+            type(instance).objects.filter(pk=instance.pk).update(
+                **{renditions_field: {}}
+            )
+        return
+
+    if renditions.get("source") != image.name:
+        enqueue_on_commit(
+            build_renditions,
+            queue="images",
+            model=instance._meta.label,
+            pk=instance.pk,
+            field_name=field_name,
+            renditions_field=renditions_field,
+            version_field=version_field,
+        )
+
+
+def list_image_url(image, renditions: dict, request=None) -> str | None:
+    """URL of the feed-sized rendition, or of the original until it is ready"""
+    if not image:
+        return None
+
+    name = image.name
+    if renditions.get("source") == image.name:
+        name = renditions.get(str(settings.IMAGE_LIST_RENDITION_WIDTH), name)
+
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
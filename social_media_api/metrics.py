@@ -0,0 +1,146 @@
+"""Prometheus metrics, aggregated across worker processes.
+
+When PROMETHEUS_MULTIPROC_DIR points to a writable directory, every process
+writes its samples to memory-mapped files there and /metrics merges them,
+so the numbers cover all gunicorn/uvicorn workers instead of the one that
+happened to serve the scrape. The directory must be emptied on deploy.
+"""
+import hmac
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by view, method and status",
+    ["view", "method", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by view",
+    ["view", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by view",
+    ["view"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+QUERIES = Histogram(
+    "db_queries_per_request",
+    "Database queries run per HTTP request by view",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Application cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by database and state (idle/in_use)",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a free pooled database connection",
+    ["database"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that found no free pooled connection in time",
+    ["database"],
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "db_connections_opened_total",
+    "New database connections opened by the pool",
+    ["database"],
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag of read replicas, +Inf while unreachable",
+    ["database"],
+    multiprocess_mode="max",
+)
+
+
+def observe_request(
+    view: str, method: str, response, seconds: float, queries: int
+) -> None:
+    REQUESTS.labels(view, method, response.status_code).inc()
+    LATENCY.labels(view, method).observe(seconds)
+    QUERIES.labels(view).observe(queries)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+
+
+def observe_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def observe_pool_size(database: str, idle: int, in_use: int) -> None:
+    DB_POOL_CONNECTIONS.labels(database, "idle").set(idle)
+    DB_POOL_CONNECTIONS.labels(database, "in_use").set(in_use)
+
+
+def observe_pool_wait(database: str, seconds: float, acquired: bool) -> None:
+    DB_POOL_WAIT.labels(database).observe(seconds)
+    if not acquired:
+        DB_POOL_TIMEOUTS.labels(database).inc()
+
+
+def observe_connection_opened(database: str) -> None:
+    DB_CONNECTIONS_OPENED.labels(database).inc()
+
+
+def observe_replica_lag(database: str, lag: float | None) -> None:
+    DB_REPLICA_LAG.labels(database).set(float("inf") if lag is None else lag)
+
+
+def scrape_allowed(request) -> bool:
+    """Whether a request may read /metrics, by bearer token or client address"""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(
+            token.encode(), settings.METRICS_TOKEN.encode()
+        ):
+            return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics_view(request) -> HttpResponse:
+    """Prometheus scrape endpoint in the text exposition format"""
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,315 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+from social_media_api import metrics
+from social_media_api.db import router
+
+logger = logging.getLogger("social_media_api.sql")
+
+SQL_LITERAL_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql: str) -> str:
+    """Statement shape with literals and IN lists collapsed, for grouping"""
+    for pattern, replacement in SQL_LITERAL_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    """Statements run during a request and the time spent executing each"""
+
+    def __init__(self):
+        self.timings: list[tuple[str, float]] = []
+
+    @property
+    def statements(self) -> list[str]:
+        return [sql for sql, _ in self.timings]
+
+    @property
+    def duration(self) -> float:
+        return sum(seconds for _, seconds in self.timings)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # list.append is atomic, threads of one request may share a recorder
+            self.timings.append((sql, time.perf_counter() - start))
+
+
+current_recorder: ContextVar[QueryRecorder | None] = ContextVar(
+    "current_recorder", default=None
+)
+
+
+def dispatch_query(execute, sql, params, many, context):
+    """execute_wrapper of every connection, recording into the active recorder"""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_dispatch(connection) -> None:
+    if dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs) -> None:
+    install_query_dispatch(connection)
+
+
+@contextmanager
+def record_queries():
+    """Record the statements run while the block is active.
+
+    The recorder lives in a context variable, so queries are caught on any
+    connection and in threads spawned by sync_to_async, not just on the
+    connection of the current thread. Nested blocks share the outer recorder.
+    """
+    recorder = current_recorder.get()
+    if recorder is not None:
+        yield recorder
+        return
+
+    for connection in connections.all(initialized_only=True):
+        install_query_dispatch(connection)
+    recorder = QueryRecorder()
+    token = current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_recorder.reset(token)
+
+
+def view_label(request) -> str:
+    """Resolved view and action name (ex. PostViewSet.list) of a request"""
+    match = request.resolver_match
+    if match is None:
+        return "unresolved"
+
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return match._func_path
+    actions = getattr(match.func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+class QueryInstrumentationMiddleware:
+    """Count queries and database time of every request.
+
+    Adds a Server-Timing header and logs requests over the SQL_QUERY_BUDGET
+    or SQL_LATENCY_BUDGET_MS budgets, and statements repeated at least
+    SQL_REPEAT_THRESHOLD times (N+1 patterns), with the view name attached.
+    Statements are only fingerprinted when something gets logged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    def process(self, request, response, recorder: QueryRecorder, total: float):
+        response["Server-Timing"] = (
+            f'db;dur={recorder.duration * 1000:.2f};'
+            f'desc="{len(recorder.timings)} queries", '
+            f"app;dur={total * 1000:.2f}"
+        )
+        self.report(request, recorder, total)
+        return response
+
+    @staticmethod
+    def report(request, recorder: QueryRecorder, total: float) -> None:
+        count = len(recorder.timings)
+        over_budget = (
+            count > settings.SQL_QUERY_BUDGET
+            or total * 1000 > settings.SQL_LATENCY_BUDGET_MS
+        )
+        if not over_budget and count < settings.SQL_REPEAT_THRESHOLD:
+            return
+
+        view_name = view_label(request)
+        fingerprints = Counter(map(fingerprint, recorder.statements))
+
+        for statement, repeats in fingerprints.most_common():
+            if repeats < settings.SQL_REPEAT_THRESHOLD:
+                break
+            logger.warning(
+                "Repeated query in %s %s (%s): %d times: %s",
+                request.method,
+                request.path,
+                view_name,
+                repeats,
+                statement,
+            )
+
+        if over_budget:
+            logger.warning(
+                "Slow request %s %s (%s): %d queries, %.1f ms in database, "
+                "%.1f ms total\n%s",
+                request.method,
+                request.path,
+                view_name,
+                count,
+                recorder.duration * 1000,
+                total * 1000,
+                "\n".join(
+                    f"{repeats:>4} x {statement}"
+                    for statement, repeats in fingerprints.most_common()
+                ),
+            )
+
+
+class MetricsMiddleware:
+    """Record request count, latency, response size and queries per view"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    @staticmethod
+    def process(request, response, recorder: QueryRecorder, total: float):
+        metrics.observe_request(
+            view_label(request),
+            request.method,
+            response,
+            total,
+            len(recorder.timings),
+        )
+        return response
+
+
+class AsyncRoutesMiddleware:
+    """Resolve requests served over ASGI with ASGI_URLCONF.
+
+    That urlconf maps the read-heavy endpoints to async views and falls back
+    to the regular routes, WSGI requests are left untouched.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Scope replica routing to a request and remember who just wrote.
+
+    Reads start on the primary for every request, views opt into replicas
+    with router.route_reads(). A successful unsafe request by a signed in
+    user keeps their reads on the primary for the stickiness window.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = router.read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            router.read_database.reset(token)
+        self.process(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = router.read_database.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            router.read_database.reset(token)
+        self.process(request, response)
+        return response
+
+    @staticmethod
+    def process(request, response) -> None:
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            router.stick_to_primary(user.pk)
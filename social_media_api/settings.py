@@ -40,15 +40,22 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
     "drf_spectacular",
     "rest_framework",
     "user",
     "post",
+    "jobs",
+    "bench",
 ]
 
 MIDDLEWARE = [
+    "social_media_api.middleware.MetricsMiddleware",
+    "social_media_api.middleware.QueryInstrumentationMiddleware",
+    "social_media_api.middleware.AsyncRoutesMiddleware",
+    "social_media_api.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,6 +66,26 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "social_media_api.urls"
+# Used instead of ROOT_URLCONF for requests served over ASGI
+ASGI_URLCONF = "social_media_api.urls_asgi"
+
+# Per-request SQL instrumentation, see social_media_api.middleware
+SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "True") == "True"
+SQL_QUERY_BUDGET = int(os.environ.get("SQL_QUERY_BUDGET", 20))
+SQL_LATENCY_BUDGET_MS = int(os.environ.get("SQL_LATENCY_BUDGET_MS", 500))
+SQL_REPEAT_THRESHOLD = int(os.environ.get("SQL_REPEAT_THRESHOLD", 5))
+
+# Prometheus metrics served at /metrics, set PROMETHEUS_MULTIPROC_DIR to
+# aggregate them across worker processes
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+# Scrapes must come from one of these addresses or networks, or send
+# "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_ALLOWED_IPS = [
+    address.strip()
+    for address in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+    if address.strip()
+]
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 TEMPLATES = [
     {
@@ -84,7 +111,8 @@ WSGI_APPLICATION = "social_media_api.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        # PostgreSQL with a per-process connection pool, see social_media_api.db
+        "ENGINE": "social_media_api.db",
         "NAME": os.environ.get(
             "POSTGRES_DB", os.path.join(BASE_DIR, "db.sqlite3")
         ),
@@ -92,9 +120,90 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "password"),
         "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Connections go back to the pool at the end of every request
+        "CONN_MAX_AGE": 0,
+        "POOL": {
+            # Per worker process, DB_POOL_MAX_SIZE=0 disables pooling
+            "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "TIMEOUT": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "MAX_IDLE": int(os.environ.get("DB_POOL_MAX_IDLE", 300)),
+            "CHECK_AFTER": int(os.environ.get("DB_POOL_CHECK_AFTER", 1)),
+        },
+    }
+}
+
+# Read replicas of default, comma separated host[:port][/name] entries
+# ex. "replica-1,replica-2:5433" or "localhost/social_replica"
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICAS", "").split(",")), start=1
+):
+    address, _, name = replica.strip().partition("/")
+    host, _, port = address.partition(":")
+    DATABASE_REPLICAS.append(f"replica_{number}")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host or DATABASES["default"]["HOST"],
+        "PORT": port or DATABASES["default"]["PORT"],
+        "NAME": name or DATABASES["default"]["NAME"],
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["social_media_api.db.router.ReplicaRouter"]
+# Reads stay on the primary for this long after a user's own write
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", 10)
+)
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get("DATABASE_REPLICA_MAX_LAG", 5))
+DATABASE_REPLICA_CHECK_INTERVAL = int(
+    os.environ.get("DATABASE_REPLICA_CHECK_INTERVAL", 5)
+)
+
+# Number of web worker processes, as read by gunicorn
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    # Per-process, short-lived user state for token authentication
+    "auth": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "auth",
+        "TIMEOUT": int(os.environ.get("AUTH_USER_STATE_TIMEOUT", 30)),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
+POST_DETAIL_CACHE_TIMEOUT = int(
+    os.environ.get("POST_DETAIL_CACHE_TIMEOUT", 60 * 60 * 24)
+)
+POST_DETAIL_CACHE_LOCK_TIMEOUT = int(
+    os.environ.get("POST_DETAIL_CACHE_LOCK_TIMEOUT", 5)
+)
+POST_COMMENT_PREVIEW_SIZE = int(os.environ.get("POST_COMMENT_PREVIEW_SIZE", 3))
+# Newest followers and followings printed by a profile, the rest is paginated
+PROFILE_FOLLOW_PREVIEW_SIZE = int(os.environ.get("PROFILE_FOLLOW_PREVIEW_SIZE", 20))
+# Rows fetched per server-side cursor round trip by data exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+# A process-local cache misses the invalidations made by other processes
+# (workers, run_worker, import commands), so cached follow sets only live
+# for seconds there
+FOLLOW_GRAPH_CACHE_TIMEOUT = int(
+    os.environ.get(
+        "FOLLOW_GRAPH_CACHE_TIMEOUT",
+        10 if CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES else 60 * 60 * 24,
+    )
+)
+FOLLOW_SUGGESTIONS_LIMIT = int(os.environ.get("FOLLOW_SUGGESTIONS_LIMIT", 20))
+
 AUTH_USER_MODEL = "user.User"
 
 # Password validation
@@ -136,6 +245,27 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Resized copies of uploaded post and profile images, rendered in the background
+
+IMAGE_RENDITION_WIDTHS = (160, 480, 1080)
+IMAGE_LIST_RENDITION_WIDTH = 480
+IMAGE_RENDITION_QUALITY = 80
+
+# Database-backed background jobs, see `python manage.py run_worker`
+# JOBS_QUEUES maps every queue to the number of worker threads serving it.
+
+JOBS_QUEUES = {
+    "default": int(os.environ.get("JOBS_DEFAULT_CONCURRENCY", 2)),
+    "timeline": int(os.environ.get("JOBS_TIMELINE_CONCURRENCY", 2)),
+    "images": int(os.environ.get("JOBS_IMAGES_CONCURRENCY", 1)),
+}
+JOBS_EAGER = os.environ.get("JOBS_EAGER", "False") == "True"
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 2
+JOBS_RETRY_BACKOFF_MAX = 600
+JOBS_LOCK_TIMEOUT = 600
+JOBS_POLL_INTERVAL = 1.0
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -144,7 +274,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.LazyJWTAuthentication",
     ),
 }
 
@@ -154,6 +284,16 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
 }
 
+# Home timeline fan-out
+# Posts of authors with more followers than the limit are not copied into
+# every follower's timeline, they are pulled at read time instead.
+
+TIMELINE_FANOUT_FOLLOWER_LIMIT = int(
+    os.environ.get("TIMELINE_FANOUT_FOLLOWER_LIMIT", 10000)
+)
+TIMELINE_BACKFILL_SIZE = int(os.environ.get("TIMELINE_BACKFILL_SIZE", 200))
+TIMELINE_BATCH_SIZE = int(os.environ.get("TIMELINE_BATCH_SIZE", 1000))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Social Media API",
     "DESCRIPTION": "Created posts, likes and add comments",
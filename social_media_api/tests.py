@@ -0,0 +1,266 @@
+import asyncio
+import time
+from functools import partial
+from unittest import mock
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, OperationalError, connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from social_media_api import aio
+from rest_framework.test import APIClient
+
+from post.models import Post
+from social_media_api.db import pool as db_pool
+from social_media_api.db import router
+from social_media_api.db.pool import ConnectionPool, PoolExhausted, checkout_nowait
+
+METRICS_URL = reverse("metrics")
+
+
+class MetricsAccessTests(TestCase):
+    def test_loopback_scrape_is_allowed(self) -> None:
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"])
+    def test_scrape_from_allowed_network(self) -> None:
+        response = self.client.get(METRICS_URL, REMOTE_ADDR="10.1.2.3")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_scrape_from_other_address_is_forbidden(self) -> None:
+        response = self.client.get(METRICS_URL, REMOTE_ADDR="203.0.113.5")
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_scrape_with_token(self) -> None:
+        allowed = self.client.get(
+            METRICS_URL, REMOTE_ADDR="203.0.113.5", HTTP_AUTHORIZATION="Bearer secret"
+        )
+        wrong = self.client.get(
+            METRICS_URL, REMOTE_ADDR="203.0.113.5", HTTP_AUTHORIZATION="Bearer other"
+        )
+
+        self.assertEqual(allowed.status_code, 200)
+        self.assertEqual(wrong.status_code, 403)
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def create_pool(max_size: int = 2, **options) -> ConnectionPool:
+    options = {"timeout": 0.1, "max_idle": 60, "check_after": 60, **options}
+    return ConnectionPool("test", max_size=max_size, **options)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_released_connection_is_reused(self) -> None:
+        pool = create_pool()
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_connection_released_without_reuse_is_closed(self) -> None:
+        pool = create_pool()
+        first = pool.acquire(FakeConnection)
+        pool.release(first, reuse=False)
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.acquire(FakeConnection), first)
+
+    def test_full_pool_times_out(self) -> None:
+        pool = create_pool(max_size=1)
+        pool.acquire(FakeConnection)
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(FakeConnection)
+
+    def test_nowait_checkout_fails_at_once(self) -> None:
+        pool = create_pool(max_size=1, timeout=10)
+        pool.acquire(FakeConnection)
+
+        token = checkout_nowait.set(True)
+        try:
+            with self.assertRaises(PoolExhausted):
+                pool.acquire(FakeConnection)
+        finally:
+            checkout_nowait.reset(token)
+
+    def test_failed_connect_frees_the_slot(self) -> None:
+        pool = create_pool(max_size=1)
+
+        with self.assertRaises(DatabaseError):
+            pool.acquire(mock.Mock(side_effect=DatabaseError))
+
+        self.assertIsInstance(pool.acquire(FakeConnection), FakeConnection)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_expired_idle_connection_is_replaced(self) -> None:
+        pool = create_pool(max_idle=0)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        self.assertIsNot(pool.acquire(FakeConnection), first)
+        self.assertTrue(first.closed)
+
+
+def run_sql(sql: str):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone()[0]
+
+
+class PooledConcurrentQueriesTests(TransactionTestCase):
+    """Async requests holding a connection while gathering nested queries"""
+
+    pool_size = 3
+
+    def setUp(self) -> None:
+        connections.close_all()
+        options = connection.settings_dict["POOL"]
+        patches = [
+            mock.patch.dict(db_pool.pools, clear=True),
+            mock.patch.dict(options, MAX_SIZE=self.pool_size, TIMEOUT=5),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(db_pool.close_idle_connections)
+        self.addCleanup(connections.close_all)
+
+    def current_pool(self) -> ConnectionPool:
+        (pool,) = db_pool.pools.values()
+        return pool
+
+    async def request(self, *nested_sql: str) -> list:
+        # One thread and connection per request, as the ASGI handler does
+        async with ThreadSensitiveContext():
+            await sync_to_async(run_sql)("SELECT 1 FROM pg_sleep(0.1)")
+            try:
+                return await aio.gather_queries(
+                    *(partial(run_sql, sql) for sql in nested_sql)
+                )
+            finally:
+                await sync_to_async(connections.close_all)()
+
+    def run_requests(self, count: int, *nested_sql: str) -> list:
+        """Serve concurrent requests on an event loop of their own.
+
+        Outside async_to_sync, so every request gets its own thread like
+        under the ASGI server instead of sharing the test's thread.
+        """
+
+        async def serve():
+            return await asyncio.wait_for(
+                asyncio.gather(
+                    *(self.request(*nested_sql) for _ in range(count)),
+                    return_exceptions=True,
+                ),
+                timeout=60,
+            )
+
+        return asyncio.run(serve())
+
+    def test_more_requests_than_connections_complete(self) -> None:
+        count = self.pool_size * 3
+        results = self.run_requests(
+            count, "SELECT 1 FROM pg_sleep(0.1)", "SELECT 2", "SELECT 3"
+        )
+
+        self.assertEqual(results, [[1, 2, 3]] * count)
+        self.assertEqual(self.current_pool().in_use, 0)
+
+    def test_failed_nested_query_hands_back_its_connection(self) -> None:
+        (result,) = self.run_requests(1, "SELECT 1 / 0", "SELECT 1 FROM pg_sleep(0.2)")
+        # The sibling query keeps running after gather() gave up on it
+        time.sleep(0.5)
+
+        self.assertIsInstance(result, DatabaseError)
+        self.assertEqual(self.current_pool().in_use, 0)
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica_1", "replica_2"],
+    DATABASE_REPLICA_MAX_LAG=5,
+    DATABASE_REPLICA_CHECK_INTERVAL=60,
+    DATABASE_REPLICA_STICKY_SECONDS=10,
+)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        for patch in (
+            mock.patch.dict(router.replica_lag, clear=True),
+            mock.patch.dict(router.lag_checked_at, clear=True),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password"
+        )
+
+    def route_with_lags(self, **lags) -> str | None:
+        token = router.read_database.set(None)
+        try:
+            with mock.patch.object(router, "measure_lag", side_effect=lags.get):
+                return router.route_reads(self.user)
+        finally:
+            router.read_database.reset(token)
+
+    def test_reads_go_to_a_healthy_replica(self) -> None:
+        alias = self.route_with_lags(replica_1=10.0, replica_2=1.0)
+
+        self.assertEqual(alias, "replica_2")
+
+    def test_reads_stay_on_primary_without_healthy_replica(self) -> None:
+        self.assertIsNone(self.route_with_lags(replica_1=10.0, replica_2=None))
+
+    def test_reads_stay_on_primary_after_own_write(self) -> None:
+        router.stick_to_primary(self.user.pk)
+
+        self.assertTrue(router.is_sticky(self.user.pk))
+        self.assertIsNone(self.route_with_lags(replica_1=0.0, replica_2=0.0))
+
+    def test_stickiness_expires(self) -> None:
+        with override_settings(DATABASE_REPLICA_STICKY_SECONDS=1):
+            router.stick_to_primary(self.user.pk)
+        later = time.time() + 2
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later
+
+            self.assertFalse(router.is_sticky(self.user.pk))
+
+    def test_lag_is_rechecked_after_the_interval(self) -> None:
+        self.route_with_lags(replica_1=0.0, replica_2=0.0)
+
+        self.assertIsNotNone(self.route_with_lags(replica_1=None, replica_2=None))
+        with override_settings(DATABASE_REPLICA_CHECK_INTERVAL=0):
+            self.assertIsNone(self.route_with_lags(replica_1=None, replica_2=None))
+
+    def test_successful_write_sticks_the_user_to_primary(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.user)
+        post = Post.objects.create(author=self.user, content="Mine")
+
+        with mock.patch.object(router, "measure_lag", return_value=None):
+            client.get(reverse("post:post-detail", args=[post.pk]))
+            self.assertFalse(router.is_sticky(self.user.pk))
+
+            client.post(reverse("user:user-follow", args=[self.user.pk + 100]))
+            self.assertFalse(router.is_sticky(self.user.pk))
+
+            response = client.post(reverse("post:post-like", args=[post.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(router.is_sticky(self.user.pk))
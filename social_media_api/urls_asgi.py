@@ -0,0 +1,31 @@
+"""Routes used for requests served over ASGI, see AsyncRoutesMiddleware.
+
+GET requests of the read-heavy endpoints go to async views, other methods
+and every other route are served by the regular synchronous API.
+"""
+from django.urls import include, path
+
+from post import async_views as post_async_views
+from post.urls import router as post_router
+from social_media_api.aio import async_route
+from user import async_views as user_async_views
+from user.urls import urlpatterns as user_urlpatterns
+
+post_views = {pattern.name: pattern.callback for pattern in post_router.urls}
+user_views = {pattern.name: pattern.callback for pattern in user_urlpatterns}
+
+urlpatterns = [
+    path(
+        "api/post/",
+        async_route(post_async_views.feed_list, post_views["post-list"]),
+    ),
+    path(
+        "api/post/<int:pk>/",
+        async_route(post_async_views.post_detail, post_views["post-detail"]),
+    ),
+    path(
+        "api/user/<int:pk>/",
+        async_route(user_async_views.user_detail, user_views["user-detail"]),
+    ),
+    path("", include("social_media_api.urls")),
+]
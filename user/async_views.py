@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.http import HttpResponseBase
+from rest_framework.exceptions import NotFound
+
+from social_media_api import aio
+from social_media_api.conditional import add_validators, not_modified
+from user.serializers import UserRetrieveSerializer
+from user.views import (
+    follow_prefetches,
+    listed_users,
+    profile_etag,
+    profile_last_modified,
+)
+
+
+@aio.async_api_view
+async def user_detail(request, pk: int) -> HttpResponseBase:
+    """User profile, the following and follower lists load concurrently"""
+    user = await get_user_model().objects.filter(pk=pk).afirst()
+    if user is None:
+        raise NotFound
+
+    listed_changed_at = (
+        await listed_users(user.pk).aaggregate(changed_at=Max("updated_at"))
+    )["changed_at"]
+    etag = profile_etag(user, listed_changed_at)
+    last_modified = profile_last_modified(user, listed_changed_at)
+    if response := not_modified(request, etag, last_modified):
+        return response
+
+    await aio.prefetch_concurrently([user], *follow_prefetches())
+    data = UserRetrieveSerializer(user, context={"request": request}).data
+    return add_validators(aio.json_response(data), etag, last_modified)
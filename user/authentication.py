@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from social_media_api.metrics import observe_cache
+
+USER_MISSING = "missing"
+
+
+def user_state_cache_key(user_id) -> str:
+    return f"user:state:{user_id}"
+
+
+def user_state(user_id) -> tuple[bool, bool] | None:
+    """``(is_active, is_staff)`` of a user, None if it no longer exists.
+
+    Answers come from the in-process ``auth`` cache, so a deactivated, demoted
+    or deleted user loses its access within its timeout without a query per
+    request.
+    """
+    state_cache = caches["auth"]
+    key = user_state_cache_key(user_id)
+    state = state_cache.get(key)
+    observe_cache("user_state", state is not None)
+    if state is None:
+        state = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list("is_active", "is_staff")
+            .first()
+        )
+        state = USER_MISSING if state is None else state
+        state_cache.set(key, state)
+
+    return None if state == USER_MISSING else state
+
+
+class LazyJWTAuthentication(JWTAuthentication):
+    """JWT authentication that builds ``request.user`` without a row lookup.
+
+    The user carries the token's ``id`` and the cached ``is_active`` and
+    ``is_staff`` only, every other field is deferred and loaded from the
+    database on first access.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        state = user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        is_active, is_staff = state
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user_model = self.user_model
+        values = {
+            user_model._meta.pk.attname: user_model._meta.pk.to_python(user_id),
+            "is_active": is_active,
+            "is_staff": is_staff,
+        }
+        # from_db() expects the values in the order of the model's fields
+        field_names = [
+            field.attname
+            for field in user_model._meta.concrete_fields
+            if field.attname in values
+        ]
+        return user_model.from_db(
+            DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names]
+        )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def follow_graph_cache_check(app_configs, **kwargs) -> list[Error]:
+    """Several workers need a shared cache to see each other's follow changes"""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.WEB_CONCURRENCY > 1 and backend in settings.PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"{backend} is local to one process, but WEB_CONCURRENCY is "
+                f"{settings.WEB_CONCURRENCY}: workers would serve follow graphs "
+                "and read-your-writes windows the others already changed.",
+                hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache "
+                "(ex. django.core.cache.backends.redis.RedisCache).",
+                id="user.E001",
+            )
+        ]
+    return []
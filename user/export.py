@@ -0,0 +1,134 @@
+"""Export of a user's data as NDJSON, one typed JSON record per line.
+
+Every table is read through a server-side cursor in EXPORT_CHUNK_SIZE rows
+and encoded as it arrives, so memory use does not depend on the size of
+the account.
+"""
+import zlib
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet, Value
+
+from post.models import Comment, Like, Post
+from user.models import UserFollowing
+
+# Records are joined into chunks of about this many bytes before sending
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def typed_rows(record_type: str, queryset: QuerySet) -> Iterator[dict]:
+    for row in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {"type": record_type, **row}
+
+
+def export_records(user) -> Iterator[dict]:
+    """The profile, posts, comments, likes and follows of a user"""
+    user_id = getattr(user, "pk", user)
+
+    yield from typed_rows(
+        "user",
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .values(
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "bio",
+            "country",
+            "city",
+            "picture",
+            "date_joined",
+        ),
+    )
+    posts = typed_rows(
+        "post",
+        Post.objects.filter(author_id=user_id)
+        .annotate(
+            hashtag_names=ArrayAgg(
+                "hashtags__name",
+                filter=Q(hashtags__isnull=False),
+                ordering="hashtags__name",
+                default=Value([]),
+            )
+        )
+        .order_by("id")
+        .values(
+            "id",
+            "content",
+            "image",
+            "created_at",
+            "likes_count",
+            "comments_count",
+            "hashtag_names",
+        ),
+    )
+    for post in posts:
+        post["hashtags"] = post.pop("hashtag_names")
+        yield post
+
+    yield from typed_rows(
+        "comment",
+        Comment.objects.filter(user_id=user_id)
+        .order_by("id")
+        .values("id", "post_id", "content", "created_at"),
+    )
+    yield from typed_rows(
+        "like",
+        Like.objects.filter(user_id=user_id).order_by("id").values("post_id"),
+    )
+    yield from typed_rows(
+        "following",
+        UserFollowing.objects.filter(follower_id=user_id)
+        .order_by("id")
+        .values(
+            user=F("user_id_id"),
+            first_name=F("user_id__first_name"),
+            last_name=F("user_id__last_name"),
+        ),
+    )
+    yield from typed_rows(
+        "follower",
+        UserFollowing.objects.filter(user_id=user_id)
+        .order_by("id")
+        .values(
+            user=F("follower_id_id"),
+            first_name=F("follower_id__first_name"),
+            last_name=F("follower_id__last_name"),
+        ),
+    )
+
+
+def ndjson_chunks(records: Iterable[dict]) -> Iterator[bytes]:
+    """Encode records as NDJSON, grouped into chunks of EXPORT_BUFFER_SIZE"""
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    buffer = []
+    size = 0
+    for record in records:
+        line = f"{encoder.encode(record)}\n".encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into a gzip stream as it goes"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(user, compress: bool = False) -> Iterator[bytes]:
+    chunks = ndjson_chunks(export_records(user))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,85 @@
+import uuid
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from social_media_api.metrics import observe_cache
+from user.models import UserFollowing
+
+ID_ARRAY_TYPECODE = "q"
+
+
+def followings_generation_key(user_id: int) -> str:
+    return f"user:followings:{user_id}:generation"
+
+
+def followings_cache_key(user_id: int, generation: str) -> str:
+    return f"user:followings:{user_id}:{generation}"
+
+
+def followings_generation(user_id: int) -> str:
+    """Current generation of a cached following set, started when missing.
+
+    Follow changes start a new generation instead of deleting the set, so a
+    set read before the change and written after it is never read again.
+    """
+    key = followings_generation_key(user_id)
+    generation = uuid.uuid4().hex
+    if not cache.add(key, generation, settings.FOLLOW_GRAPH_CACHE_TIMEOUT):
+        generation = cache.get(key, generation)
+    return generation
+
+
+def encode_ids(ids) -> bytes:
+    """Pack ids into a sorted array of 64-bit integers"""
+    return array(ID_ARRAY_TYPECODE, sorted(ids)).tobytes()
+
+
+def decode_ids(data: bytes) -> frozenset[int]:
+    ids = array(ID_ARRAY_TYPECODE)
+    ids.frombytes(data)
+    return frozenset(ids)
+
+
+def followings_of(user) -> frozenset[int]:
+    """Ids of the users someone follows, read from the cache and warmed lazily"""
+    user_id = getattr(user, "pk", user)
+    key = followings_cache_key(user_id, followings_generation(user_id))
+    data = cache.get(key)
+    observe_cache("followings", data is not None)
+    if data is None:
+        # Only dropped on follow changes, so never filled from a lagging replica
+        data = encode_ids(
+            UserFollowing.objects.using(DEFAULT_DB_ALIAS)
+            .filter(follower_id=user_id)
+            .values_list("user_id", flat=True)
+        )
+        cache.set(key, data, settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+
+    return decode_ids(data)
+
+
+def is_following(follower, user) -> bool:
+    return getattr(user, "pk", user) in followings_of(follower)
+
+
+def visible_author_ids(user) -> list[int]:
+    """Authors whose posts a user can see: themselves and their followings"""
+    return [user.pk, *followings_of(user)]
+
+
+def start_followings_generations(user_ids) -> None:
+    cache.set_many(
+        {
+            followings_generation_key(user_id): uuid.uuid4().hex
+            for user_id in user_ids
+        },
+        settings.FOLLOW_GRAPH_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_followings(user_id: int) -> None:
+    """Retire a cached following set once the follow change is committed"""
+    transaction.on_commit(lambda: start_followings_generations([user_id]))
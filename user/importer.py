@@ -0,0 +1,388 @@
+"""Bulk import of users, follows, posts and likes from NDJSON or CSV.
+
+Every batch is written into temporary staging tables with COPY and moved
+into the real tables by set-based INSERT ... SELECT statements. Source ids
+are mapped to local ones through ImportedId, rows that already exist are
+skipped, and a batch commits together with its id mappings, so loading a
+batch twice changes nothing and an interrupted import can resume.
+
+Model signals do not run. Counters, versions and follow timestamps are
+kept up to date by the batch statements, timelines have to be rebuilt
+afterwards.
+"""
+import csv
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, is_password_usable
+from django.db import connection, transaction
+
+from user.graph import start_followings_generations
+
+# Fields read from every record type, in staging table column order
+RECORD_FIELDS = {
+    "user": (
+        "id",
+        "email",
+        "password",
+        "first_name",
+        "last_name",
+        "bio",
+        "country",
+        "city",
+        "date_joined",
+    ),
+    "post": ("id", "author", "content", "created_at"),
+    "follow": ("follower", "followed"),
+    "like": ("user", "post"),
+}
+
+# Record types in the order their batches are loaded, so references
+# between records of one batch resolve
+IMPORT_ORDER = ("user", "post", "follow", "like")
+
+# Tables whose secondary indexes and foreign keys can be deferred
+DEFERRABLE_TABLES = (
+    "user_user",
+    "user_userfollowing",
+    "post_post",
+    "post_like",
+    "post_posthashtag",
+)
+
+CREATE_STAGING_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS import_{kind} ({columns})
+    ON COMMIT DELETE ROWS
+"""
+
+CREATE_NEW_POSTS_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS import_new_post (
+        id bigint, content text, created_at timestamptz
+    )
+    ON COMMIT DELETE ROWS
+"""
+
+USERS_SQL = """
+    INSERT INTO user_user (
+        password, is_superuser, first_name, last_name, is_staff, is_active,
+        date_joined, email, bio, country, city, picture_renditions,
+        followers_count, followings_count, updated_at
+    )
+    SELECT
+        COALESCE(password, '!' || md5(random()::text)),
+        false,
+        COALESCE(first_name, ''),
+        COALESCE(last_name, ''),
+        false,
+        true,
+        COALESCE(date_joined::timestamptz, now()),
+        email,
+        bio,
+        country,
+        city,
+        '{}',
+        0,
+        0,
+        now()
+    FROM import_user
+    WHERE email IS NOT NULL
+    ON CONFLICT (email) DO NOTHING
+"""
+
+# Users already in the database are mapped to their existing account
+USER_IDS_SQL = """
+    INSERT INTO user_importedid (kind, external_id, local_id)
+    SELECT 'user', staged.id, user_user.id
+    FROM import_user AS staged
+    JOIN user_user ON user_user.email = staged.email
+    WHERE staged.id IS NOT NULL
+    ON CONFLICT DO NOTHING
+"""
+
+# Post ids are drawn from the sequence up front so the mapping and the
+# post are written by the same statement
+POSTS_SQL = """
+    WITH new_posts AS (
+        SELECT DISTINCT ON (staged.id)
+            staged.id,
+            author.local_id AS author_id,
+            staged.content,
+            COALESCE(staged.created_at::timestamptz, now()) AS created_at
+        FROM import_post AS staged
+        JOIN user_importedid AS author
+            ON author.kind = 'user' AND author.external_id = staged.author
+        WHERE staged.id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM user_importedid AS imported
+            WHERE imported.kind = 'post' AND imported.external_id = staged.id
+        )
+        ORDER BY staged.id
+    ),
+    mapped AS (
+        INSERT INTO user_importedid (kind, external_id, local_id)
+        SELECT 'post', id, nextval(pg_get_serial_sequence('post_post', 'id'))
+        FROM new_posts
+        ON CONFLICT DO NOTHING
+        RETURNING external_id, local_id
+    ),
+    inserted AS (
+        INSERT INTO post_post (
+            id, author_id, content, created_at, image_renditions,
+            likes_count, comments_count, version
+        )
+        SELECT mapped.local_id, new_posts.author_id, new_posts.content,
+            new_posts.created_at, '{}', 0, 0, 1
+        FROM mapped
+        JOIN new_posts ON new_posts.id = mapped.external_id
+        RETURNING id, content, created_at
+    )
+    INSERT INTO import_new_post SELECT id, content, created_at FROM inserted
+"""
+
+# Same tags as post.hashtags.extract_hashtags
+HASHTAGS_SQL = """
+    INSERT INTO post_hashtag (name)
+    SELECT DISTINCT lower(tag[1])
+    FROM import_new_post
+    CROSS JOIN LATERAL regexp_matches(content, '#(\\w{1,50})', 'g') AS tag
+    ON CONFLICT DO NOTHING
+"""
+
+POST_HASHTAGS_SQL = """
+    INSERT INTO post_posthashtag (post_id, hashtag_id, created_at)
+    SELECT DISTINCT post.id, post_hashtag.id, post.created_at
+    FROM import_new_post AS post
+    CROSS JOIN LATERAL regexp_matches(post.content, '#(\\w{1,50})', 'g') AS tag
+    JOIN post_hashtag ON post_hashtag.name = lower(tag[1])
+    ON CONFLICT DO NOTHING
+"""
+
+FOLLOWS_SQL = """
+    WITH inserted AS (
+        INSERT INTO user_userfollowing (user_id_id, follower_id_id)
+        SELECT followed.local_id, follower.local_id
+        FROM import_follow AS staged
+        JOIN user_importedid AS follower
+            ON follower.kind = 'user' AND follower.external_id = staged.follower
+        JOIN user_importedid AS followed
+            ON followed.kind = 'user' AND followed.external_id = staged.followed
+        WHERE follower.local_id <> followed.local_id
+        ON CONFLICT DO NOTHING
+        RETURNING user_id_id, follower_id_id
+    ),
+    changes AS (
+        SELECT id, sum(followers) AS followers, sum(followings) AS followings
+        FROM (
+            SELECT user_id_id AS id, 1 AS followers, 0 AS followings
+            FROM inserted
+            UNION ALL
+            SELECT follower_id_id, 0, 1 FROM inserted
+        ) AS edges
+        GROUP BY id
+    ),
+    updated AS (
+        UPDATE user_user SET
+            followers_count = followers_count + changes.followers,
+            followings_count = followings_count + changes.followings,
+            follows_changed_at = CASE
+                WHEN changes.followings > 0 THEN now()
+                ELSE follows_changed_at
+            END,
+            updated_at = now()
+        FROM changes
+        WHERE user_user.id = changes.id
+    )
+    SELECT follower_id_id FROM inserted
+"""
+
+LIKES_SQL = """
+    WITH inserted AS (
+        INSERT INTO post_like (user_id, post_id)
+        SELECT liker.local_id, post.local_id
+        FROM import_like AS staged
+        JOIN user_importedid AS liker
+            ON liker.kind = 'user' AND liker.external_id = staged.user
+        JOIN user_importedid AS post
+            ON post.kind = 'post' AND post.external_id = staged.post
+        ON CONFLICT DO NOTHING
+        RETURNING post_id
+    ),
+    updated AS (
+        UPDATE post_post SET
+            likes_count = likes_count + changes.likes,
+            version = version + 1
+        FROM (
+            SELECT post_id, count(*) AS likes FROM inserted GROUP BY post_id
+        ) AS changes
+        WHERE post_post.id = changes.post_id
+    )
+    SELECT count(*) FROM inserted
+"""
+
+DEFERRABLE_INDEXES_SQL = """
+    SELECT format('DROP INDEX %%I', index.relname),
+        pg_get_indexdef(pg_index.indexrelid)
+    FROM pg_index
+    JOIN pg_class AS index ON index.oid = pg_index.indexrelid
+    WHERE pg_index.indrelid = ANY(%s::regclass[])
+        AND NOT pg_index.indisunique
+        AND NOT pg_index.indisprimary
+"""
+
+DEFERRABLE_FOREIGN_KEYS_SQL = """
+    SELECT format('ALTER TABLE %%s DROP CONSTRAINT %%I', conrelid::regclass, conname),
+        format(
+            'ALTER TABLE %%s ADD CONSTRAINT %%I %%s',
+            conrelid::regclass,
+            conname,
+            pg_get_constraintdef(oid)
+        )
+    FROM pg_constraint
+    WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])
+"""
+
+
+def open_source(path: str):
+    """Text stream of a source file, gzip-compressed ones included"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def source_format(path: str) -> str:
+    suffix = Path(path.removesuffix(".gz")).suffix
+    return "csv" if suffix == ".csv" else "ndjson"
+
+
+def read_records(
+    path: str, file_format: str, default_type: str | None = None
+) -> Iterator[tuple[str, tuple]]:
+    """(record type, staging row) pairs of a source file"""
+    with open_source(path) as source:
+        if file_format == "csv":
+            records = csv.DictReader(source)
+        else:
+            records = (json.loads(line) for line in source if line.strip())
+
+        normalize_email = get_user_model().objects.normalize_email
+        for number, record in enumerate(records, start=1):
+            kind = record.get("type") or default_type
+            if kind not in RECORD_FIELDS:
+                raise ValueError(f"record {number} has unknown type {kind!r}")
+
+            row = tuple(record.get(field) for field in RECORD_FIELDS[kind])
+            if kind == "user":
+                user_id, email, password, *rest = row
+                if not is_password_hash(password):
+                    raise ValueError(
+                        f"record {number} has a password that is not a "
+                        "Django password hash"
+                    )
+                row = (user_id, email and normalize_email(email), password, *rest)
+            yield kind, row
+
+
+def is_password_hash(password: str | None) -> bool:
+    """Whether a source password can be stored as is.
+
+    Hashing plain text passwords would cost a full key derivation per user,
+    so sources have to send hashes of a configured hasher (or none at all).
+    """
+    if not password or not is_password_usable(password):
+        return True
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return False
+    return True
+
+
+def create_staging_tables(cursor) -> None:
+    for kind, fields in RECORD_FIELDS.items():
+        columns = ", ".join(f"{connection.ops.quote_name(field)} text" for field in fields)
+        cursor.execute(CREATE_STAGING_SQL.format(kind=kind, columns=columns))
+    cursor.execute(CREATE_NEW_POSTS_SQL)
+
+
+def copy_rows(cursor, kind: str, rows: list[tuple]) -> None:
+    """COPY rows into a staging table, None is sent as NULL"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY import_{kind} FROM STDIN WITH (FORMAT csv)", buffer)
+    # Temporary tables are never analyzed automatically, without statistics
+    # joins against a large ImportedId table get planned badly
+    cursor.execute(f"ANALYZE import_{kind}")
+
+
+def load_users(cursor) -> int:
+    cursor.execute(USERS_SQL)
+    created = cursor.rowcount
+    cursor.execute(USER_IDS_SQL)
+    return created
+
+
+def load_posts(cursor) -> int:
+    cursor.execute(POSTS_SQL)
+    created = cursor.rowcount
+    cursor.execute(HASHTAGS_SQL)
+    cursor.execute(POST_HASHTAGS_SQL)
+    return created
+
+
+def load_follows(cursor) -> int:
+    cursor.execute(FOLLOWS_SQL)
+    follower_ids = [follower_id for follower_id, in cursor.fetchall()]
+    changed_ids = set(follower_ids)
+    transaction.on_commit(lambda: start_followings_generations(changed_ids))
+    return len(follower_ids)
+
+
+def load_likes(cursor) -> int:
+    cursor.execute(LIKES_SQL)
+    return cursor.fetchone()[0]
+
+
+LOADERS = {
+    "user": load_users,
+    "post": load_posts,
+    "follow": load_follows,
+    "like": load_likes,
+}
+
+
+def load_batch(batch: dict[str, list[tuple]]) -> dict[str, int]:
+    """Import one batch of staged rows in a single transaction.
+
+    Returns the number of rows created per record type, records that already
+    exist or refer to unknown ids are skipped.
+    """
+    created = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_staging_tables(cursor)
+        for kind in IMPORT_ORDER:
+            if rows := batch.get(kind):
+                copy_rows(cursor, kind, rows)
+                created[kind] = LOADERS[kind](cursor)
+    return created
+
+
+def deferrable_statements() -> list[tuple[str, str]]:
+    """(drop, create) statements of the secondary indexes and foreign keys
+    of the imported tables. Unique ones stay, imports rely on them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(DEFERRABLE_INDEXES_SQL, [list(DEFERRABLE_TABLES)])
+        indexes = cursor.fetchall()
+        cursor.execute(DEFERRABLE_FOREIGN_KEYS_SQL, [list(DEFERRABLE_TABLES)])
+        foreign_keys = cursor.fetchall()
+    return [*indexes, *foreign_keys]
+
+
+def execute_all(statements: list[str]) -> None:
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
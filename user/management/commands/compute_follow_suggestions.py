@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from user.suggestions import load_following_graph, save_suggestions, stale_user_ids
+
+
+class Command(BaseCommand):
+    """Command to precompute "who to follow" suggestions from friends-of-friends"""
+
+    help = (
+        "Count second-degree follows and store the top suggestions of every "
+        "user whose neighborhood changed since the last run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of edges fetched and users written per round trip",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=settings.FOLLOW_SUGGESTIONS_LIMIT,
+            help="Number of suggestions stored per user",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every user, not only the ones with changed follows",
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        batch_size = options["batch_size"]
+
+        following = load_following_graph(batch_size)
+        user_ids = stale_user_ids(following, full=options["full"])
+
+        total = 0
+        for start in range(0, len(user_ids), batch_size):
+            total += save_suggestions(
+                user_ids[start:start + batch_size],
+                following,
+                options["limit"],
+                started_at,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Follow suggestions computed for {len(user_ids)} users: {total}"
+            )
+        )
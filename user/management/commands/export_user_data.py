@@ -0,0 +1,49 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from user.export import export_stream
+
+
+class Command(BaseCommand):
+    """Command to export everything a user created, the same as /api/user/me/export/"""
+
+    help = "Write a user's profile, posts, comments, likes and follows as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Email of the exported user")
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File the export is written to, - for stdout",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Compress the export with gzip",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        chunks = export_stream(user, compress=options["gzip"])
+        if options["output"] == "-":
+            self.write_chunks(chunks, sys.stdout.buffer)
+            return
+
+        with open(options["output"], "wb") as output:
+            size = self.write_chunks(chunks, output)
+        self.stderr.write(f"Wrote {size} bytes to {options['output']}")
+
+    @staticmethod
+    def write_chunks(chunks, output) -> int:
+        size = 0
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+        output.flush()
+        return size
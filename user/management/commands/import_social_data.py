@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from collections import Counter
+from io import StringIO
+from itertools import islice
+
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import DatabaseError
+
+from user import importer
+
+
+class Command(BaseCommand):
+    """Command to bulk load users, follows, posts and likes of another network"""
+
+    help = (
+        "Import NDJSON or CSV records (optionally .gz) of type user, follow, "
+        "post and like with COPY, mapping source ids to new ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="Files imported in order")
+        parser.add_argument(
+            "--format",
+            choices=("ndjson", "csv"),
+            help="Format of the files, by default guessed from their extension",
+        )
+        parser.add_argument(
+            "--type",
+            choices=tuple(importer.RECORD_FIELDS),
+            help="Type of the records without a type field (ex. every CSV row)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of records loaded per COPY and transaction",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording progress, an interrupted import resumes from it",
+        )
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help=(
+                "Drop secondary indexes and foreign keys of the imported tables "
+                "while loading and recreate them at the end (needs --checkpoint)"
+            ),
+        )
+        parser.add_argument(
+            "--rebuild-timelines",
+            action="store_true",
+            help="Rebuild the timelines of all users once the files are imported",
+        )
+
+    def handle(self, *args, **options):
+        if options["defer_indexes"] and not options["checkpoint"]:
+            raise CommandError("--defer-indexes needs a --checkpoint to recover from")
+
+        self.checkpoint_path = options["checkpoint"]
+        self.checkpoint = self.read_checkpoint()
+        self.created = Counter(self.checkpoint["created"])
+        self.read = 0
+        self.started = self.reported = time.monotonic()
+
+        if options["defer_indexes"] and not self.checkpoint["deferred"]:
+            statements = importer.deferrable_statements()
+            self.checkpoint["deferred"] = [create for _, create in statements]
+            self.write_checkpoint()
+            importer.execute_all([drop for drop, _ in statements])
+
+        try:
+            for path in options["files"]:
+                self.import_file(path, options)
+        finally:
+            if self.checkpoint["deferred"]:
+                self.stderr.write("Recreating deferred indexes and foreign keys")
+                importer.execute_all(self.checkpoint["deferred"])
+                self.checkpoint["deferred"] = []
+                self.write_checkpoint()
+
+        if options["rebuild_timelines"]:
+            call_command("rebuild_timelines", stdout=StringIO())
+
+        summary = ", ".join(
+            f"{kind}s {self.created[kind]}" for kind in importer.IMPORT_ORDER
+        )
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary}"))
+
+    def import_file(self, path: str, options: dict) -> None:
+        key = os.path.abspath(path)
+        done = self.checkpoint["files"].get(key, 0)
+        records = importer.read_records(
+            path, options["format"] or importer.source_format(path), options["type"]
+        )
+
+        # Records before the checkpoint were committed by an earlier run
+        records = islice(records, done, None)
+        try:
+            while batch := list(islice(records, options["batch_size"])):
+                rows = {}
+                for kind, row in batch:
+                    rows.setdefault(kind, []).append(row)
+
+                self.created.update(importer.load_batch(rows))
+                done += len(batch)
+                self.read += len(batch)
+                self.checkpoint["files"][key] = done
+                self.checkpoint["created"] = dict(self.created)
+                self.write_checkpoint()
+                self.report_progress()
+        except (ValueError, DatabaseError) as error:
+            raise CommandError(
+                f"{path}: import stopped after {done} records, {str(error).strip()}"
+            ) from error
+
+    def report_progress(self) -> None:
+        now = time.monotonic()
+        if now - self.reported < 1:
+            return
+
+        self.reported = now
+        rate = self.read / (now - self.started)
+        counts = ", ".join(
+            f"{kind}s {self.created[kind]}" for kind in importer.IMPORT_ORDER
+        )
+        self.stderr.write(f"{counts} ({rate:.0f} records/s)")
+
+    def read_checkpoint(self) -> dict:
+        checkpoint = {"files": {}, "created": {}, "deferred": []}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as source:
+                checkpoint.update(json.load(source))
+        return checkpoint
+
+    def write_checkpoint(self) -> None:
+        if not self.checkpoint_path:
+            return
+
+        # Replaced in one step, a crash never leaves half a checkpoint
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w") as output:
+            json.dump(self.checkpoint, output)
+        os.replace(temporary_path, self.checkpoint_path)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.core.management import BaseCommand
+
+from user.models import UserFollowing
+
+
+def count_subquery(field: str) -> Coalesce:
+    rows = (
+        UserFollowing.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    """Command to rebuild denormalized follower and following counters on users"""
+
+    help = "Recalculate User.followers_count and User.followings_count from follows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users fixed per UPDATE statement",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report users with drifted counters, do not fix them",
+        )
+
+    def handle(self, *args, **options):
+        drifted_ids = (
+            get_user_model()
+            .objects.annotate(
+                actual_followers=count_subquery("user_id"),
+                actual_followings=count_subquery("follower_id"),
+            )
+            .filter(
+                ~Q(followers_count=F("actual_followers"))
+                | ~Q(followings_count=F("actual_followings"))
+            )
+            .order_by()
+            .values_list("id", flat=True)
+        )
+
+        total = 0
+        batch = []
+        for user_id in drifted_ids.iterator(chunk_size=options["batch_size"]):
+            batch.append(user_id)
+            if len(batch) >= options["batch_size"]:
+                total += self.reconcile(batch, options["dry_run"])
+                batch = []
+        if batch:
+            total += self.reconcile(batch, options["dry_run"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"Users with drifted counters: {total}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Follow counters reconciled: {total}"))
+
+    @staticmethod
+    def reconcile(user_ids: list[int], dry_run: bool) -> int:
+        if dry_run:
+            return len(user_ids)
+
+        with transaction.atomic():
+            return get_user_model().objects.filter(id__in=user_ids).update(
+                followers_count=count_subquery("user_id"),
+                followings_count=count_subquery("follower_id"),
+            )
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counters(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    UserFollowing = apps.get_model("user", "UserFollowing")
+
+    def count_subquery(field):
+        rows = (
+            UserFollowing.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    User.objects.update(
+        followers_count=count_subquery("user_id"),
+        followings_count=count_subquery("follower_id"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0003_alter_userfollowing_follower_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="followings_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_follow_counters, migrations.RunPython.noop),
+    ]
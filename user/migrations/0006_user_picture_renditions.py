@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0005_user_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="picture_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
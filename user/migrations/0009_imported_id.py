@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0008_user_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportedId",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=10)),
+                ("external_id", models.CharField(max_length=255)),
+                ("local_id", models.BigIntegerField()),
+            ],
+            options={
+                "unique_together": {("kind", "external_id")},
+            },
+        ),
+    ]
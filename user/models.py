@@ -2,10 +2,11 @@ import os
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.translation import gettext as _
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.utils.text import slugify
 
 
 class UserManager(BaseUserManager):
@@ -44,7 +45,7 @@ class UserManager(BaseUserManager):
 
 def user_image_file_path(instance, filename) ->str:
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(instance.title)}-{uuid.uuid4()}{extension}"
+    filename = f"user-{instance.id}-{uuid.uuid4()}{extension}"
 
     return os.path.join("uploads/image/", filename)
 
@@ -58,18 +59,57 @@ class User(AbstractUser):
     country = models.CharField(max_length=50, null=True, blank=True)
     city = models.CharField(max_length=50, null=True, blank=True)
     picture = models.ImageField(null=True, upload_to=user_image_file_path)
+    picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    followings_count = models.PositiveIntegerField(default=0, editable=False)
+    follows_changed_at = models.DateTimeField(null=True, editable=False)
+    suggestions_computed_at = models.DateTimeField(null=True, editable=False)
+    # Last change of the profile, its counters included
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            GinIndex(
+                OpClass(Upper(field), name="gin_trgm_ops"),
+                name=f"user_{field}_trgm_idx",
+            )
+            for field in ("first_name", "last_name", "country", "city")
+        ]
+
     def __str__(self) ->str:
         return f"{self.first_name} {self.last_name}"
 
-    @property
-    def count_followers(self) -> int:
-        return self.followers.count()
+    def save(self, *args, **kwargs) -> None:
+        """Write only the editable columns of an existing user.
+
+        Follow counters, their change time and the renditions are shifted by
+        atomic UPDATEs, a full save of a loaded user would write their stale
+        values back.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if (field.editable or field.name == "updated_at")
+                and not field.primary_key
+            ]
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None) -> None:
+        """Load all deferred fields together on first access to one of them.
+
+        Token-backed request users only carry a few fields, the rest of the
+        row is fetched in a single query instead of one query per attribute.
+        """
+        deferred_fields = self.get_deferred_fields()
+        if fields is not None and deferred_fields:
+            fields = {*fields, *deferred_fields}
+        super().refresh_from_db(using=using, fields=fields)
 
 
 class UserFollowing(models.Model):
@@ -90,3 +130,45 @@ class UserFollowing(models.Model):
 
     def __str__(self) -> str:
         return f"User {self.user_id} follows user {self.follower_id}"
+
+
+class FollowSuggestion(models.Model):
+    """A precomputed "who to follow" entry, scored by mutual connections"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="follow_suggestions"
+    )
+    suggested = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="suggested_to"
+    )
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("user", "suggested")
+        indexes = [
+            models.Index(
+                fields=["user", "-score", "suggested"],
+                name="follow_suggestion_score_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Suggest user {self.suggested_id} to user {self.user_id}"
+
+
+class ImportedId(models.Model):
+    """Row created by import_social_data for an id of the source system"""
+
+    kind = models.CharField(max_length=10)
+    external_id = models.CharField(max_length=255)
+    local_id = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ("kind", "external_id")
+
+    def __str__(self) -> str:
+        return f"Imported {self.kind} {self.external_id} as {self.local_id}"
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view) -> tuple[str, ...]:
+        if "similarity" in queryset.query.annotations:
+            return ("-similarity", "-id")
+        return super().get_ordering(request, queryset, view)
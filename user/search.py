@@ -0,0 +1,37 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import FloatField, Q, QuerySet
+from django.db.models.functions import Cast, Greatest, Upper
+
+SEARCH_FIELDS = ("first_name", "last_name", "country", "city")
+MAX_SEARCH_WORDS = 5
+
+
+def search_users(queryset: QuerySet, text: str) -> QuerySet:
+    """Fuzzy match users by name and location, annotated by similarity.
+
+    Every word of the text is compared with every field through
+    ``UPPER(field)``, so the lookups hit the same trigram indexes that
+    serve the ``icontains`` filters. Users matching more words rank higher.
+    """
+    words = text.split()[:MAX_SEARCH_WORDS]
+    if not words:
+        return queryset.none().annotate(similarity=Cast(0, FloatField()))
+
+    queryset = queryset.alias(
+        **{f"{field}_upper": Upper(field) for field in SEARCH_FIELDS}
+    )
+
+    matches = Q()
+    similarity = None
+    for word in words:
+        for field in SEARCH_FIELDS:
+            matches |= Q(**{f"{field}_upper__trigram_word_similar": word})
+
+        word_similarity = Greatest(
+            *(TrigramWordSimilarity(word, f"{field}_upper") for field in SEARCH_FIELDS)
+        )
+        similarity = (
+            word_similarity if similarity is None else similarity + word_similarity
+        )
+
+    return queryset.filter(matches).annotate(similarity=Cast(similarity, FloatField()))
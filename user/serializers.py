@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from social_media_api.images import list_image_url
 from user.models import UserFollowing, User
 
 
@@ -71,17 +72,23 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, set the password correctly and return it"""
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
 
-        return user
+        return super().update(instance, validated_data)
 
 
 class UserRetrieveSerializer(serializers.ModelSerializer):
-    followings = UserFollowSerializer(read_only=True, many=True)
-    followers = UserFollowersSerializer(read_only=True, many=True)
+    followings = UserFollowSerializer(
+        source="latest_followings", read_only=True, many=True
+    )
+    followers = UserFollowersSerializer(
+        source="latest_followers", read_only=True, many=True
+    )
+    count_followers = serializers.IntegerField(source="followers_count", read_only=True)
+    count_followings = serializers.IntegerField(
+        source="followings_count", read_only=True
+    )
 
     class Meta:
         model = get_user_model()
@@ -97,10 +104,18 @@ class UserRetrieveSerializer(serializers.ModelSerializer):
             "picture",
             "followings",
             "followers",
+            "count_followers",
+            "count_followings",
         )
 
 
 class UserListSerializer(serializers.ModelSerializer):
+    picture = serializers.SerializerMethodField()
+    count_followers = serializers.IntegerField(source="followers_count", read_only=True)
+    count_followings = serializers.IntegerField(
+        source="followings_count", read_only=True
+    )
+
     class Meta:
         model = get_user_model()
         fields = ("id",
@@ -110,4 +125,18 @@ class UserListSerializer(serializers.ModelSerializer):
                   "city",
                   "picture",
                   "count_followers",
+                  "count_followings",
                   )
+
+    def get_picture(self, user: User) -> str | None:
+        return list_image_url(
+            user.picture, user.picture_renditions, self.context.get("request")
+        )
+
+
+class UserSuggestionSerializer(UserListSerializer):
+    mutual_followings = serializers.IntegerField(read_only=True)
+
+    class Meta(UserListSerializer.Meta):
+        fields = UserListSerializer.Meta.fields + ("mutual_followings",)
+
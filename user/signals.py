@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from social_media_api import images
+from user import graph
+from user.models import UserFollowing
+
+
+def change_user_counter(user_id: int, field: str, delta: int) -> None:
+    """Atomically shift a denormalized counter column on a user"""
+    get_user_model().objects.filter(pk=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)}, updated_at=timezone.now()
+    )
+
+
+def mark_follows_changed(user_id: int) -> None:
+    """Flag a changed neighborhood for the next follow suggestions run"""
+    get_user_model().objects.filter(pk=user_id).update(
+        follows_changed_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=UserFollowing)
+def following_created(sender, instance, created, **kwargs) -> None:
+    if created:
+        change_user_counter(instance.user_id_id, "followers_count", 1)
+        change_user_counter(instance.follower_id_id, "followings_count", 1)
+        graph.invalidate_followings(instance.follower_id_id)
+        mark_follows_changed(instance.follower_id_id)
+
+
+@receiver(post_delete, sender=UserFollowing)
+def following_deleted(sender, instance, **kwargs) -> None:
+    change_user_counter(instance.user_id_id, "followers_count", -1)
+    change_user_counter(instance.follower_id_id, "followings_count", -1)
+    graph.invalidate_followings(instance.follower_id_id)
+    mark_follows_changed(instance.follower_id_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, update_fields=None, **kwargs) -> None:
+    if update_fields is None or "picture" in update_fields:
+        images.sync_renditions(instance, "picture", "picture_renditions")
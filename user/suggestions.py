@@ -0,0 +1,73 @@
+from array import array
+from collections import Counter, defaultdict
+from heapq import nsmallest
+from itertools import chain
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from user.models import FollowSuggestion, UserFollowing
+
+
+def load_following_graph(chunk_size: int) -> dict[int, array]:
+    """Stream the follow edge list into a compact array of followed ids per user"""
+    following = defaultdict(lambda: array("q"))
+    edges = UserFollowing.objects.order_by().values_list("follower_id", "user_id")
+    for follower_id, user_id in edges.iterator(chunk_size=chunk_size):
+        following[follower_id].append(user_id)
+    return dict(following)
+
+
+def suggest_for(
+    user_id: int, following: dict[int, array], limit: int
+) -> list[tuple[int, int]]:
+    """Top friends-of-friends of a user as (user id, mutual connections) pairs"""
+    direct = following.get(user_id, ())
+    counts = Counter(chain.from_iterable(following.get(f, ()) for f in direct))
+    for excluded in chain((user_id,), direct):
+        counts.pop(excluded, None)
+
+    return nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def stale_user_ids(following: dict[int, array], full: bool = False) -> list[int]:
+    """Users whose own follows or whose followings' follows changed since their
+    suggestions were computed, or every user on a full run.
+    """
+    users = get_user_model().objects.order_by("id").values_list(
+        "id", "follows_changed_at", "suggestions_computed_at"
+    )
+    changed_at = {}
+    computed_at = {}
+    for user_id, follows_changed_at, suggestions_computed_at in users.iterator():
+        changed_at[user_id] = follows_changed_at
+        computed_at[user_id] = suggestions_computed_at
+
+    def is_stale(user_id: int) -> bool:
+        computed = computed_at[user_id]
+        if full or computed is None:
+            return True
+        return any(
+            changed_at.get(neighbor) is not None and changed_at[neighbor] > computed
+            for neighbor in chain((user_id,), following.get(user_id, ()))
+        )
+
+    return [user_id for user_id in computed_at if is_stale(user_id)]
+
+
+def save_suggestions(
+    user_ids: list[int], following: dict[int, array], limit: int, computed_at
+) -> int:
+    """Replace the stored suggestions of a batch of users"""
+    suggestions = [
+        FollowSuggestion(user_id=user_id, suggested_id=suggested_id, score=score)
+        for user_id in user_ids
+        for suggested_id, score in suggest_for(user_id, following, limit)
+    ]
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FollowSuggestion.objects.bulk_create(suggestions)
+        get_user_model().objects.filter(id__in=user_ids).update(
+            suggestions_computed_at=computed_at
+        )
+    return len(suggestions)
@@ -1,3 +1,632 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import (
+    AsyncClient,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user import graph
+from user.authentication import LazyJWTAuthentication
+from user.checks import follow_graph_cache_check
+from post.models import Comment, Like, Post
+from user.models import ImportedId, UserFollowing
+from user.serializers import UserUpdateSerializer
+
+MANAGE_URL = reverse("user:manage")
+
+
+def create_user(email: str, **fields):
+    return get_user_model().objects.create_user(
+        email=email, password="password", **fields
+    )
+
+
+class ProfileEditTests(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user("user@example.com")
+        self.follower = create_user("follower@example.com")
+        self.followed = create_user("followed@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def edit_during(self, side_effect, data: dict):
+        """Patch the profile while ``side_effect`` runs after it was loaded"""
+
+        def validate(serializer, attrs):
+            side_effect()
+            return attrs
+
+        with mock.patch.object(UserUpdateSerializer, "validate", validate):
+            return self.client.patch(MANAGE_URL, data)
+
+    def test_follows_during_edit_are_kept(self) -> None:
+        def follow():
+            UserFollowing.objects.create(user_id=self.user, follower_id=self.follower)
+            UserFollowing.objects.create(user_id=self.followed, follower_id=self.user)
+
+        response = self.edit_during(follow, {"bio": "Edited"})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, "Edited")
+        self.assertEqual(self.user.followers_count, 1)
+        self.assertEqual(self.user.followings_count, 1)
+        self.assertIsNotNone(self.user.follows_changed_at)
+
+    def test_password_change_keeps_counters(self) -> None:
+        response = self.edit_during(
+            lambda: UserFollowing.objects.create(
+                user_id=self.user, follower_id=self.follower
+            ),
+            {"password": "new-password"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-password"))
+        self.assertEqual(self.user.followers_count, 1)
+
+    def test_edit_moves_updated_at(self) -> None:
+        updated_at = get_user_model().objects.get(pk=self.user.pk).updated_at
+
+        self.client.patch(MANAGE_URL, {"city": "Kyiv"})
+
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.updated_at, updated_at)
+
+
+class FollowingsCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = create_user("user@example.com")
+        self.followed = create_user("followed@example.com")
+
+    def test_follow_retires_cached_set(self) -> None:
+        self.assertEqual(graph.followings_of(self.user), frozenset())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserFollowing.objects.create(user_id=self.followed, follower_id=self.user)
+
+        self.assertEqual(graph.followings_of(self.user), {self.followed.pk})
+
+    def test_set_read_before_follow_is_not_served_after_it(self) -> None:
+        encode_ids = graph.encode_ids
+
+        def follow_after_read(ids):
+            stale_ids = list(ids)
+            with self.captureOnCommitCallbacks(execute=True):
+                UserFollowing.objects.create(
+                    user_id=self.followed, follower_id=self.user
+                )
+            return encode_ids(stale_ids)
+
+        with mock.patch.object(graph, "encode_ids", follow_after_read):
+            self.assertEqual(graph.followings_of(self.user), frozenset())
+
+        self.assertEqual(graph.followings_of(self.user), {self.followed.pk})
+
+    def test_lost_generation_starts_a_new_one(self) -> None:
+        graph.followings_of(self.user)
+        cache.delete(graph.followings_generation_key(self.user.pk))
+        UserFollowing.objects.bulk_create(
+            [UserFollowing(user_id=self.followed, follower_id=self.user)]
+        )
+
+        self.assertEqual(graph.followings_of(self.user), {self.followed.pk})
+
+
+class FollowingsAcrossProcessesTests(TestCase):
+    """Follow changes made while another process holds a cached set"""
+
+    def setUp(self) -> None:
+        self.user = create_user("user@example.com")
+        self.followed = create_user("followed@example.com")
+
+    def follow_in(self, process_cache) -> None:
+        with mock.patch.object(graph, "cache", process_cache):
+            with self.captureOnCommitCallbacks(execute=True):
+                UserFollowing.objects.create(user_id=self.followed, follower_id=self.user)
+
+    def followings_in(self, process_cache) -> frozenset[int]:
+        with mock.patch.object(graph, "cache", process_cache):
+            return graph.followings_of(self.user)
+
+    def test_shared_cache_retires_set_filled_by_other_process(self) -> None:
+        reader = LocMemCache("shared-follow-graph", {})
+        writer = LocMemCache("shared-follow-graph", {})
+        reader.clear()
+        self.assertEqual(self.followings_in(reader), frozenset())
+
+        self.follow_in(writer)
+
+        self.assertEqual(self.followings_in(reader), {self.followed.pk})
+
+    @override_settings(FOLLOW_GRAPH_CACHE_TIMEOUT=10)
+    def test_process_local_set_expires_within_the_timeout(self) -> None:
+        reader = LocMemCache("reader-process", {})
+        writer = LocMemCache("writer-process", {})
+        reader.clear()
+        self.assertEqual(self.followings_in(reader), frozenset())
+
+        self.follow_in(writer)
+
+        later = time.time() + 11
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later
+            self.assertEqual(self.followings_in(reader), {self.followed.pk})
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_check_rejects_process_local_cache_with_several_workers(self) -> None:
+        (error,) = follow_graph_cache_check(None)
+
+        self.assertEqual(error.id, "user.E001")
+
+    @override_settings(
+        WEB_CONCURRENCY=4,
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://localhost:6379",
+            }
+        },
+    )
+    def test_check_accepts_shared_cache(self) -> None:
+        self.assertEqual(follow_graph_cache_check(None), [])
+
+
+class ProfileRevalidationTests(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user("user@example.com", first_name="Ann")
+        self.followed = create_user("followed@example.com", first_name="Bob")
+        UserFollowing.objects.create(user_id=self.followed, follower_id=self.user)
+        self.url = reverse("user:user-detail", args=[self.user.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def revalidate(self, etag: str):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_profile_is_not_modified(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+
+        self.assertEqual(self.revalidate(etag).status_code, 304)
+
+    def test_edit_within_the_same_second_changes_etag(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+        self.client.patch(MANAGE_URL, {"bio": "Edited"})
+
+        self.assertEqual(self.revalidate(etag).status_code, 200)
+
+    def test_profile_carries_last_modified(self) -> None:
+        response = self.client.get(self.url)
+        self.user.refresh_from_db()
+        self.followed.refresh_from_db()
+
+        changed_at = max(self.user.updated_at, self.followed.updated_at)
+        self.assertEqual(response["Last-Modified"], http_date(changed_at.timestamp()))
+        revalidated = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_etag_wins_over_last_modified(self) -> None:
+        response = self.client.get(self.url)
+        self.client.patch(MANAGE_URL, {"bio": "Edited"})
+
+        revalidated = self.client.get(
+            self.url,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60),
+        )
+
+        self.assertEqual(revalidated.status_code, 200)
+
+    def test_listed_user_rename_changes_etag(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+        self.followed.first_name = "Robert"
+        self.followed.save()
+
+        response = self.revalidate(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+def create_followers(user, count: int) -> list:
+    followers = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"follower{number}@example.com")
+        for number in range(count)
+    )
+    UserFollowing.objects.bulk_create(
+        UserFollowing(user_id=user, follower_id=follower) for follower in followers
+    )
+    call_command("rebuild_follow_counters", stdout=StringIO())
+    return followers
+
+
+@override_settings(PROFILE_FOLLOW_PREVIEW_SIZE=2)
+class ProfileFollowListsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = create_user("user@example.com")
+        cls.followers = create_followers(cls.user, 30)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_prints_newest_follows_only(self) -> None:
+        url = reverse("user:user-detail", args=[self.user.pk])
+
+        # Profile, ETag of the listed users and the two previews
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["follower_id"] for row in response.data["followers"]],
+            [self.followers[29].pk, self.followers[28].pk],
+        )
+        self.assertEqual(response.data["followings"], [])
+        self.assertEqual(response.data["count_followers"], 30)
+
+    def test_followers_are_paginated(self) -> None:
+        url = reverse("user:user-followers", args=[self.user.pk])
+
+        first = self.client.get(url, {"page_size": 20})
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(
+            [row["id"] for row in first.data["results"] + second.data["results"]],
+            [follower.pk for follower in self.followers],
+        )
+        self.assertIsNone(second.data["next"])
+
+    def test_followings_are_paginated(self) -> None:
+        url = reverse("user:user-followings", args=[self.followers[0].pk])
+
+        response = self.client.get(url)
+
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [self.user.pk]
+        )
+
+
+@override_settings(PROFILE_FOLLOW_PREVIEW_SIZE=2)
+class AsyncProfileFollowListsTests(TransactionTestCase):
+    # The async view prefetches on connections of its own, the rows
+    # must be committed
+    def setUp(self) -> None:
+        self.user = create_user("user@example.com")
+        self.followers = create_followers(self.user, 30)
+
+    async def test_profile_prints_newest_follows_only(self) -> None:
+        token = AccessToken.for_user(self.user)
+
+        response = await AsyncClient().get(
+            reverse("user:user-detail", args=[self.user.pk]),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["follower_id"] for row in response.json()["followers"]],
+            [self.followers[29].pk, self.followers[28].pk],
+        )
+
+
+class UserSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.viewer = create_user("viewer@example.com")
+        create_user("smith@example.com", first_name="John", last_name="Smith")
+        create_user(
+            "smith.kyiv@example.com",
+            first_name="Anna",
+            last_name="Smith",
+            city="Kyiv",
+        )
+        create_user("other@example.com", first_name="Maria", last_name="Lopez")
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def search(self, q: str) -> list[str]:
+        response = self.client.get(reverse("user:user-list"), {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [
+            f"{user['first_name']} {user['last_name']}"
+            for user in response.data["results"]
+        ]
+
+    def test_typos_match(self) -> None:
+        self.assertEqual(self.search("lopes"), ["Maria Lopez"])
+        self.assertEqual(self.search("smit"), ["Anna Smith", "John Smith"])
+
+    def test_more_matching_words_rank_higher(self) -> None:
+        self.assertEqual(self.search("joh smitt"), ["John Smith", "Anna Smith"])
+        self.assertEqual(self.search("smith kyiv"), ["Anna Smith", "John Smith"])
+
+    def test_unrelated_users_are_left_out(self) -> None:
+        self.assertEqual(self.search("zebra"), [])
+        self.assertEqual(self.search("   "), [])
+
+
+class ExportUserDataTests(TestCase):
+    url = reverse("user:manage-export")
+
+    def setUp(self) -> None:
+        self.user = create_user("user@example.com", first_name="Ann")
+        self.friend = create_user("friend@example.com", first_name="Bob")
+        UserFollowing.objects.create(user_id=self.friend, follower_id=self.user)
+        UserFollowing.objects.create(user_id=self.user, follower_id=self.friend)
+        self.post = Post.objects.create(author=self.user, content="Hi #sea #Sun")
+        friend_post = Post.objects.create(author=self.friend, content="Not mine")
+        self.comment = Comment.objects.create(
+            post=friend_post, user=self.user, content="Nice"
+        )
+        Comment.objects.create(post=self.post, user=self.friend, content="Not mine")
+        Like.objects.create(post=friend_post, user=self.user)
+        Like.objects.create(post=self.post, user=self.friend)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def parse(content: bytes) -> list[dict]:
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def assert_export(self, records: list[dict]) -> None:
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["user", "post", "comment", "like", "following", "follower"],
+        )
+        user, post, comment, like, following, follower = records
+        self.assertEqual((user["id"], user["first_name"]), (self.user.id, "Ann"))
+        self.assertEqual(post["id"], self.post.id)
+        self.assertEqual(post["hashtags"], ["sea", "sun"])
+        self.assertEqual(post["comments_count"], 1)
+        self.assertEqual(comment["id"], self.comment.id)
+        self.assertEqual(like["post_id"], self.comment.post_id)
+        self.assertEqual(
+            following,
+            {
+                "type": "following",
+                "user": self.friend.id,
+                "first_name": "Bob",
+                "last_name": "",
+            },
+        )
+        self.assertEqual(follower["user"], self.friend.id)
+
+    def test_export_streams_own_records(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assert_export(self.parse(b"".join(response.streaming_content)))
+
+    def test_gzip_export(self) -> None:
+        response = self.client.get(self.url, {"compression": "gzip"})
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn(".ndjson.gz", response["Content-Disposition"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assert_export(self.parse(content))
+
+    def test_command_writes_the_same_export(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "export.ndjson.gz"
+
+        call_command(
+            "export_user_data",
+            "user@example.com",
+            "--output",
+            str(path),
+            "--gzip",
+            stderr=StringIO(),
+        )
+
+        self.assert_export(self.parse(gzip.decompress(path.read_bytes())))
+
+    def test_command_rejects_unknown_user(self) -> None:
+        with self.assertRaisesMessage(CommandError, "No user with email"):
+            call_command("export_user_data", "nobody@example.com")
+
+
+class LazyJWTAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        caches["auth"].clear()
+        self.user = create_user("user@example.com", first_name="Ann")
+        self.token = AccessToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def authenticate(self):
+        return LazyJWTAuthentication().get_user(self.token)
+
+    def test_token_authenticates_user(self) -> None:
+        response = self.client.get(MANAGE_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["email"], "user@example.com")
+
+    def test_inactive_user_is_rejected(self) -> None:
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.get(MANAGE_URL)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["detail"].code, "user_inactive")
+
+    def test_deleted_user_is_rejected(self) -> None:
+        self.user.delete()
+
+        response = self.client.get(MANAGE_URL)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["detail"].code, "user_not_found")
+
+    def test_staff_flag_follows_the_row(self) -> None:
+        get_user_model().objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertTrue(self.authenticate().is_staff)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(is_staff=False)
+        # Cached until the auth cache timeout
+        self.assertTrue(self.authenticate().is_staff)
+        caches["auth"].clear()
+
+        self.assertFalse(self.authenticate().is_staff)
+
+    def test_cached_state_needs_no_query(self) -> None:
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIn("email", user.get_deferred_fields())
+
+    def test_deferred_fields_load_together(self) -> None:
+        user = self.authenticate()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "user@example.com")
+            self.assertEqual(user.first_name, "Ann")
+
+        self.assertEqual(user.get_deferred_fields(), set())
+
+
+class ImportSocialDataTests(TransactionTestCase):
+    # Batches commit, their staging tables are emptied on commit only
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.password = make_password("password")
+
+    def write(self, name: str, content: str) -> str:
+        path = self.directory / name
+        path.write_text(content)
+        return str(path)
+
+    def write_ndjson(self, name: str, records: list[dict]) -> str:
+        return self.write(
+            name, "".join(f"{json.dumps(record)}\n" for record in records)
+        )
+
+    def import_data(self, *args: str) -> None:
+        call_command("import_social_data", *args, stdout=StringIO(), stderr=StringIO())
+
+    def local_id(self, kind: str, external_id: str) -> int:
+        return ImportedId.objects.get(kind=kind, external_id=external_id).local_id
+
+    def test_ndjson_import_twice_creates_everything_once(self) -> None:
+        existing = create_user("ann@example.com")
+        path = self.write_ndjson(
+            "network.ndjson",
+            [
+                {"type": "user", "id": "u1", "email": "ann@example.com"},
+                {
+                    "type": "user",
+                    "id": "u2",
+                    "email": "bob@example.com",
+                    "password": self.password,
+                    "first_name": "Bob",
+                },
+                {"type": "post", "id": "p1", "author": "u2", "content": "Hi #Sea"},
+                {"type": "post", "id": "p1", "author": "u2", "content": "Again"},
+                {"type": "post", "id": "p2", "author": "unknown", "content": "x"},
+                {"type": "follow", "follower": "u1", "followed": "u2"},
+                {"type": "follow", "follower": "u2", "followed": "u2"},
+                {"type": "like", "user": "u1", "post": "p1"},
+            ],
+        )
+
+        self.import_data(path)
+        self.import_data(path, "--batch-size", "3")
+
+        bob = get_user_model().objects.get(email="bob@example.com")
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(self.local_id("user", "u1"), existing.id)
+        self.assertEqual(self.local_id("user", "u2"), bob.id)
+        self.assertTrue(bob.check_password("password"))
+        self.assertEqual(bob.first_name, "Bob")
+
+        post = Post.objects.get()
+        self.assertEqual(post.id, self.local_id("post", "p1"))
+        self.assertEqual((post.author_id, post.content), (bob.id, "Hi #Sea"))
+        self.assertEqual(list(post.hashtags.values_list("name", flat=True)), ["sea"])
+        self.assertEqual((post.likes_count, post.version), (1, 2))
+        self.assertEqual(Like.objects.get().user_id, existing.id)
+        # The reserved ids are taken from the sequence
+        self.assertGreater(Post.objects.create(author=bob).id, post.id)
+
+        existing.refresh_from_db()
+        bob.refresh_from_db()
+        self.assertEqual(UserFollowing.objects.count(), 1)
+        self.assertEqual(
+            (existing.followings_count, existing.followers_count), (1, 0)
+        )
+        self.assertEqual((bob.followings_count, bob.followers_count), (0, 1))
+        self.assertIsNotNone(existing.follows_changed_at)
+
+    def test_csv_import_twice_creates_everything_once(self) -> None:
+        users = self.write(
+            "users.csv",
+            "id,email,password,first_name,city\n"
+            f"1,ann@example.com,{self.password},Ann,Kyiv\n"
+            "2,bob@example.com,,Bob,\n",
+        )
+        follows = self.write(
+            "follows.csv", "follower,followed\n1,2\n2,1\n1,3\n"
+        )
+
+        for _ in range(2):
+            self.import_data(users, "--type", "user")
+            self.import_data(follows, "--type", "follow")
+
+        ann = get_user_model().objects.get(pk=self.local_id("user", "1"))
+        bob = get_user_model().objects.get(pk=self.local_id("user", "2"))
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual((ann.email, ann.city), ("ann@example.com", "Kyiv"))
+        self.assertTrue(ann.check_password("password"))
+        self.assertFalse(bob.has_usable_password())
+        self.assertEqual(UserFollowing.objects.count(), 2)
+        self.assertEqual((ann.followers_count, ann.followings_count), (1, 1))
+        self.assertEqual((bob.followers_count, bob.followings_count), (1, 1))
+
+    def test_plain_text_password_is_rejected(self) -> None:
+        path = self.write_ndjson(
+            "users.ndjson",
+            [
+                {"type": "user", "id": "u1", "email": "ann@example.com"},
+                {
+                    "type": "user",
+                    "id": "u2",
+                    "email": "bob@example.com",
+                    "password": "secret",
+                },
+            ],
+        )
+
+        with self.assertRaisesMessage(CommandError, "record 2 has a password"):
+            self.import_data(path)
+
+        self.assertFalse(get_user_model().objects.exists())
@@ -5,7 +5,14 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView,
 )
 
-from user.views import CreateUserView, ManageUserView, UserView, FollowUnfollowView
+from user.views import (
+    CreateUserView,
+    ManageUserView,
+    UserView,
+    FollowUnfollowView,
+    FollowSuggestionView,
+    ExportUserDataView,
+)
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
@@ -23,8 +30,22 @@ urlpatterns = [
         ),
         name="manage"
     ),
+    path("me/export/", ExportUserDataView.as_view(), name="manage-export"),
+    path(
+        "suggestions/", FollowSuggestionView.as_view(), name="user-suggestions"
+    ),
     path("", UserView.as_view(actions={"get": "list"}), name="user-list"),
     path("<int:pk>/", UserView.as_view(actions={"get": "retrieve",}), name="user-detail"),
+    path(
+        "<int:pk>/followers/",
+        UserView.as_view(actions={"get": "followers"}),
+        name="user-followers",
+    ),
+    path(
+        "<int:pk>/followings/",
+        UserView.as_view(actions={"get": "followings"}),
+        name="user-followings",
+    ),
     path(
         "<int:pk>/follow/",
         FollowUnfollowView.as_view(actions={"post": "follow"}),
@@ -1,21 +1,104 @@
+from datetime import datetime
 from typing import Type
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import (
+    F,
+    Max,
+    Prefetch,
+    Q,
+    QuerySet,
+    prefetch_related_objects,
+)
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from social_media_api.aio import streaming_content
+from social_media_api.conditional import add_validators, make_etag, not_modified
+from social_media_api.db.router import ReplicaReadsMixin
+from user import graph
+from user.export import export_stream
 from user.models import UserFollowing
+from user.pagination import UserCursorPagination
+from user.search import search_users
 from user.serializers import (
     UserCreateSerializer,
     UserRetrieveSerializer,
-    UserUpdateSerializer, UserListSerializer, FollowingsSerializer
+    UserUpdateSerializer, UserListSerializer, FollowingsSerializer,
+    UserSuggestionSerializer,
 )
 
 
+def follow_prefetches() -> tuple[Prefetch, Prefetch]:
+    """Newest follows of the user detail, with the users they print.
+
+    Only ``PROFILE_FOLLOW_PREVIEW_SIZE`` rows of each list are loaded, the
+    full lists are paginated by the followers and followings endpoints.
+    """
+    size = settings.PROFILE_FOLLOW_PREVIEW_SIZE
+    return (
+        Prefetch(
+            "followings",
+            queryset=UserFollowing.objects.select_related("user_id").order_by("-id")[
+                :size
+            ],
+            to_attr="latest_followings",
+        ),
+        Prefetch(
+            "followers",
+            queryset=UserFollowing.objects.select_related("follower_id").order_by(
+                "-id"
+            )[:size],
+            to_attr="latest_followers",
+        ),
+    )
+
+
+def listed_users(user_id: int) -> QuerySet:
+    """Users shown in someone's following and follower previews"""
+    size = settings.PROFILE_FOLLOW_PREVIEW_SIZE
+    followings = UserFollowing.objects.filter(follower_id=user_id).order_by("-id")
+    followers = UserFollowing.objects.filter(user_id=user_id).order_by("-id")
+    return get_user_model().objects.filter(
+        Q(pk__in=followings.values("user_id")[:size])
+        | Q(pk__in=followers.values("follower_id")[:size])
+    )
+
+
+def profile_etag(user, listed_changed_at) -> str:
+    """Profile ETag, changes of the listed users' names included"""
+    return make_etag(user.pk, user.updated_at, listed_changed_at)
+
+
+def profile_last_modified(user, listed_changed_at) -> datetime:
+    """Latest change of a profile or of the users it lists"""
+    return max(filter(None, (user.updated_at, listed_changed_at)))
+
+
+def retrieve_profile(view, request) -> Response:
+    """User detail with validators, its follow lists only loaded on a miss"""
+    user = view.get_object()
+    listed_changed_at = listed_users(user.pk).aggregate(
+        changed_at=Max("updated_at")
+    )["changed_at"]
+    etag = profile_etag(user, listed_changed_at)
+    last_modified = profile_last_modified(user, listed_changed_at)
+    if response := not_modified(request, etag, last_modified):
+        return response
+
+    prefetch_related_objects([user], *follow_prefetches())
+    response = Response(view.get_serializer(user).data)
+    return add_validators(response, etag, last_modified)
+
+
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserCreateSerializer
 
@@ -30,7 +113,10 @@ class ManageUserView(
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        return retrieve_profile(self, request)
 
     def get_serializer_class(self) -> Type[UserRetrieveSerializer | UserUpdateSerializer]:
         if self.action == "retrieve":
@@ -39,19 +125,27 @@ class ManageUserView(
 
 
 class UserView(
+    ReplicaReadsMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
 ):
     permission_classes = (IsAuthenticated,)
+    pagination_class = UserCursorPagination
 
     def get_queryset(self) -> QuerySet:
-        queryset = get_user_model().objects.prefetch_related("followings", "followers")
+        queryset = get_user_model().objects.all()
+        if self.action == "followers":
+            return queryset.filter(followings__user_id=self.kwargs["pk"])
+        if self.action == "followings":
+            return queryset.filter(followers__follower_id=self.kwargs["pk"])
+
         if self.action == "list":
             first_name = self.request.query_params.get("first_name")
             last_name = self.request.query_params.get("last_name")
             country = self.request.query_params.get("country")
             city = self.request.query_params.get("city")
+            q = self.request.query_params.get("q")
 
             if first_name:
                 queryset = queryset.filter(first_name__icontains=first_name)
@@ -65,14 +159,98 @@ class UserView(
             if city:
                 queryset = queryset.filter(city__icontains=city)
 
+            if q:
+                queryset = search_users(queryset, q)
+
         return queryset
 
     def get_serializer_class(self) -> Type[UserListSerializer | UserRetrieveSerializer]:
-        if self.action == "list":
+        if self.action in ("list", "followers", "followings"):
             return UserListSerializer
 
         return UserRetrieveSerializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                description=(
+                    "Typo-tolerant search by name, country and city, "
+                    "ordered by similarity (ex. ?q=jon smit)"
+                ),
+            ),
+            OpenApiParameter("first_name", type=str),
+            OpenApiParameter("last_name", type=str),
+            OpenApiParameter("country", type=str),
+            OpenApiParameter("city", type=str),
+        ]
+    )
+    def list(self, request, *args, **kwargs) -> Response:
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        return retrieve_profile(self, request)
+
+    @action(methods=["GET"], detail=True, url_path="followers")
+    def followers(self, request, pk=None) -> Response:
+        """Endpoint for all followers of a user"""
+        return super().list(request)
+
+    @action(methods=["GET"], detail=True, url_path="followings")
+    def followings(self, request, pk=None) -> Response:
+        """Endpoint for all users a user follows"""
+        return super().list(request)
+
+
+class FollowSuggestionView(generics.ListAPIView):
+    """Precomputed "who to follow" list, most mutual connections first"""
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = UserSuggestionSerializer
+    pagination_class = None
+
+    def get_queryset(self) -> QuerySet:
+        return (
+            get_user_model()
+            .objects.filter(suggested_to__user=self.request.user)
+            .exclude(id__in=graph.followings_of(self.request.user))
+            .annotate(mutual_followings=F("suggested_to__score"))
+            .order_by("-mutual_followings", "id")
+        )
+
+
+class ExportUserDataView(APIView):
+    """Everything the signed in user created, streamed as NDJSON"""
+
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "compression",
+                type=str,
+                enum=["gzip"],
+                description="Send the export gzip-compressed (ex. ?compression=gzip)",
+            ),
+        ],
+        responses={
+            (200, "application/x-ndjson"): OpenApiTypes.BINARY,
+            (200, "application/gzip"): OpenApiTypes.BINARY,
+        },
+    )
+    def get(self, request) -> StreamingHttpResponse:
+        compress = request.query_params.get("compression") == "gzip"
+        filename = f"export-{request.user.pk}.ndjson"
+        response = StreamingHttpResponse(
+            streaming_content(request, export_stream(request.user, compress)),
+            content_type="application/gzip" if compress else "application/x-ndjson",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{filename}{".gz" if compress else ""}"'
+        )
+        return response
+
 
 class FollowUnfollowView(viewsets.GenericViewSet):
     permission_classes = (IsAuthenticated,)
@@ -94,7 +272,12 @@ class FollowUnfollowView(viewsets.GenericViewSet):
             serializer = self.get_serializer(data=data)
 
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+            self.request.user.refresh_from_db(
+                fields=["followers_count", "followings_count"]
+            )
+            prefetch_related_objects([self.request.user], *follow_prefetches())
             read_serializer = UserRetrieveSerializer(self.request.user)
             return Response(read_serializer.data, status=status.HTTP_200_OK)
 
@@ -113,5 +296,8 @@ class FollowUnfollowView(viewsets.GenericViewSet):
     def unfollow(self, request, pk=None) -> Response:
         user_id = self.kwargs.get("pk")
         follower_id = self.request.user.id
-        UserFollowing.objects.filter(user_id=user_id, follower_id=follower_id).delete()
+        with transaction.atomic():
+            UserFollowing.objects.filter(
+                user_id=user_id, follower_id=follower_id
+            ).delete()
         return Response(status=status.HTTP_200_OK)